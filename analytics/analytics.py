@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from utils import table
+
+# Races of the rolling average of fame
+DEFAULT_WINDOW = 4
+
+
+def get_rolling_mean(values, window=DEFAULT_WINDOW):
+    """Get mean of the latest window columns at each column, ignoring NaN.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        2D, rows of series.
+    window : int
+        Number of columns averaged.
+
+    Returns
+    -------
+    means : numpy.ndarray
+        Same shape as values, NaN where the window has no value.
+
+    Examples
+    --------
+    >>> get_rolling_mean(np.array([[1.0, np.nan, 3.0, 5.0]]), 2).tolist()
+    [[1.0, 1.0, 3.0, 4.0]]
+    """
+    present = ~np.isnan(values)
+    num_cols = values.shape[1]
+    # Prefix sums with a leading zero column, window sums are differences
+    sums = np.zeros((values.shape[0], num_cols + 1))
+    counts = np.zeros((values.shape[0], num_cols + 1))
+    np.cumsum(np.where(present, values, 0), axis=1, out=sums[:, 1:])
+    np.cumsum(present, axis=1, out=counts[:, 1:])
+    start = np.maximum(np.arange(1, num_cols + 1) - window, 0)
+    window_sums = sums[:, 1:] - sums[:, start]
+    window_counts = counts[:, 1:] - counts[:, start]
+    return np.divide(
+        window_sums,
+        window_counts,
+        out=np.full(values.shape, np.nan),
+        where=window_counts > 0,
+    )
+
+
+def get_streaks(mask):
+    """Get lengths of runs of True ending at each column.
+
+    Examples
+    --------
+    >>> get_streaks(np.array([[True, True, False, True]])).tolist()
+    [[1, 2, 0, 1]]
+    """
+    counts = np.cumsum(mask, axis=1)
+    # Count at the latest False, where the current run started
+    resets = np.maximum.accumulate(np.where(mask, 0, counts), axis=1)
+    return counts - resets
+
+
+def get_percentile_ranks(values):
+    """Get percentage of values less than or equal to each value.
+
+    NaN is left out of the ranking and ranked NaN.
+
+    Examples
+    --------
+    >>> get_percentile_ranks(np.array([10.0, 30.0, np.nan, 20.0])).tolist()
+    [33.33333333333333, 100.0, nan, 66.66666666666666]
+    """
+    valid = ~np.isnan(values)
+    ranked = np.sort(values[valid])
+    ranks = np.full(values.shape, np.nan)
+    if len(ranked):
+        ranks[valid] = (
+            np.searchsorted(ranked, values[valid], side="right") / len(ranked) * 100
+        )
+    return ranks
+
+
+class RaceMatrix:
+    """Fame and decks used of members in river races, member × race.
+
+    A member absent from a race (not in the clan then) is NaN, so averages
+    only count races the member took part in.
+
+    Parameters
+    ----------
+    rows : list
+        (created_date, tag, name, fame, decks_used) of participants, as
+        History.get_race_participants.
+    """
+
+    def __init__(self, rows):
+        if rows:
+            dates, tags, names, fame, decks = zip(*rows)
+        else:
+            dates = tags = names = fame = decks = ()
+
+        # Sorted unique dates are former to later
+        self.dates, date_indices = np.unique(
+            np.array(dates, dtype=str), return_inverse=True
+        )
+        self.tags, tag_indices = np.unique(
+            np.array(tags, dtype=str), return_inverse=True
+        )
+        # Rows are ordered by date, so the latest name is kept
+        latest_names = dict(zip(tags, names))
+        self.names = [latest_names[tag] for tag in self.tags]
+
+        shape = (len(self.tags), len(self.dates))
+        self.fame = np.full(shape, np.nan)
+        self.fame[tag_indices, date_indices] = np.array(fame, dtype=float)
+        self.decks = np.full(shape, np.nan)
+        self.decks[tag_indices, date_indices] = np.array(
+            [np.nan if d is None else d for d in decks], dtype=float
+        )
+
+    @classmethod
+    def from_history(cls, history, limit=0):
+        """Load participants of the latest limit races (0 for all)."""
+        return cls(history.get_race_participants(limit))
+
+    def get_present(self):
+        return ~np.isnan(self.fame)
+
+    def get_num_races(self):
+        """Get number of races each member took part in."""
+        return self.get_present().sum(axis=1)
+
+    def get_participation_rates(self):
+        """Get ratio of races with decks used to races taken part in."""
+        played = self.get_present() & (np.nan_to_num(self.decks) > 0)
+        num_races = self.get_num_races()
+        return np.divide(
+            played.sum(axis=1),
+            num_races,
+            out=np.full(num_races.shape, np.nan),
+            where=num_races > 0,
+        )
+
+    def get_mean_fame(self):
+        """Get mean fame of the races each member took part in."""
+        num_races = self.get_num_races()
+        return np.divide(
+            np.nansum(self.fame, axis=1),
+            num_races,
+            out=np.full(num_races.shape, np.nan),
+            where=num_races > 0,
+        )
+
+    def get_rolling_fame(self, window=DEFAULT_WINDOW):
+        """Get rolling mean fame of members at each race."""
+        return get_rolling_mean(self.fame, window)
+
+    def get_zero_fame_streaks(self):
+        """Get the current and the longest runs of races with zero fame.
+
+        Races a member was absent from end a run.
+
+        Returns
+        -------
+        current : numpy.ndarray
+            Run ending at the latest race.
+        longest : numpy.ndarray
+        """
+        if not len(self.dates):
+            zeros = np.zeros(len(self.tags), dtype=int)
+            return zeros, zeros
+        # NaN never equals 0, so absent races are not counted
+        streaks = get_streaks(self.fame == 0)
+        return streaks[:, -1], streaks.max(axis=1)
+
+
+def show_stats(matrix, tags=None, window=DEFAULT_WINDOW):
+    """Show participation, fame and zero fame streaks of members.
+
+    Parameters
+    ----------
+    matrix : RaceMatrix
+    tags : iterable
+        Tags of members shown, e.g. current members, None for all.
+    window : int
+        Races of the rolling average.
+    """
+    if not len(matrix.dates):
+        print("沒有河流競賽紀錄")
+        return
+
+    rates = matrix.get_participation_rates()
+    mean_fame = matrix.get_mean_fame()
+    latest_fame = matrix.get_rolling_fame(window)[:, -1]
+    current_streaks, longest_streaks = matrix.get_zero_fame_streaks()
+    ranks = get_percentile_ranks(mean_fame)
+
+    shown = np.ones(len(matrix.tags), dtype=bool)
+    if tags is not None:
+        shown = np.isin(matrix.tags, list(tags))
+    # Best first, members without races last
+    order = np.argsort(np.where(np.isnan(mean_fame), -1, mean_fame), kind="stable")
+    order = [i for i in order[::-1] if shown[i]]
+
+    def format_number(value, spec):
+        return "" if np.isnan(value) else format(value, spec)
+
+    stats_table = table.Table(
+        [
+            table.Column("名字", shrink=True),
+            table.Column("場數", dir="r"),
+            table.Column("參與率", dir="r"),
+            table.Column("平均名聲", dir="r"),
+            table.Column(f"近{window}場", dir="r"),
+            table.Column("零名聲", dir="r"),
+            table.Column("最長零名聲", dir="r"),
+            table.Column("百分位", dir="r"),
+        ],
+        sep="  ",
+    )
+    num_races = matrix.get_num_races()
+    for i in order:
+        stats_table.add_row(
+            matrix.names[i],
+            num_races[i],
+            format_number(rates[i], ".0%"),
+            format_number(mean_fame[i], ".0f"),
+            format_number(latest_fame[i], ".0f"),
+            current_streaks[i],
+            longest_streaks[i],
+            format_number(ranks[i], ".0f"),
+        )
+
+    lines = [
+        f"河流競賽統計 {matrix.dates[0][:8]} ~ {matrix.dates[-1][:8]}，"
+        f"共 {len(matrix.dates)} 場，{len(order)} 名"
+    ]
+    lines += stats_table.render(rule="=")
+    table.write(lines)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""Offline benchmarks of CRAPI and Sheet commands.
+
+Commands run against a local stand-in of the Clash Royale API and an
+in-memory fake worksheet, so no token, network or Google account is needed.
+
+    python -m benchmark.benchmark [--scenario NAME] [--latency SECONDS] [--json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmark.server import ClanData, StandInServer
+from benchmark.worksheet import FakeWorksheet
+from utils import table
+
+# Name -> size of the generated clan
+SCENARIOS = {
+    "clan-50": {"num_members": 50, "num_races": 10},
+    "racelog-long": {"num_members": 50, "num_races": 100},
+}
+
+# Commands in the order they run on one worksheet, (name, target, method)
+COMMANDS = (
+    ("members", "crapi", "get_members_dic"),
+    ("show members", "crapi", "show_members"),
+    ("show race", "crapi", "show_race"),
+    ("show racelog", "crapi", "show_racelog"),
+    ("init", "sheet", "init"),
+    ("update trophy", "sheet", "update_trophies"),
+    ("update racelog", "sheet", "update_racelog"),
+    ("update donation", "sheet", "update_donations"),
+    ("update members (churn)", "sheet", "update_members"),
+    ("update racelog (no-op)", "sheet", "update_racelog"),
+    ("update all", "sheet", "update_all"),
+)
+
+# Members replaced before the churn command
+NUM_CHURN = 5
+
+
+def run_command(name, target, method, server, worksheet, client, cold):
+    """Run a command, counting its API requests and sheet calls.
+
+    Returns
+    -------
+    result : dictionary
+        "command", "seconds", "api_calls", "sheet_calls" and "detail".
+    """
+    if cold:
+        get_response_cache().clear()
+        client.clear_snapshot()
+    server.reset_counts()
+    worksheet.calls.reset()
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        getattr(target, method)()
+    seconds = time.perf_counter() - start
+
+    detail = dict(server.counts)
+    detail.update(worksheet.calls.counts)
+    return {
+        "command": name,
+        "seconds": seconds,
+        "api_calls": sum(server.counts.values()),
+        "sheet_calls": worksheet.calls.total(),
+        "detail": detail,
+    }
+
+
+def run_scenario(name, server, clan, cold=True):
+    """Run all commands of a scenario on a new worksheet.
+
+    Parameters
+    ----------
+    name : str
+        Name of the scenario.
+    server : StandInServer
+        Server of the clan.
+    clan : ClanData
+        Clan of the scenario.
+    cold : bool
+        Clear the response cache and the clan snapshot before each command.
+    """
+    # Imported late so env of the stand-in is read by the clients
+    from crapi import crapi
+    from spreadsheet import spreadsheet
+
+    client = crapi.CRAPI(clan.clan_tag)
+    worksheet = FakeWorksheet(rows=len(clan.members) + 20, cols=26, title=name)
+    sheet = spreadsheet.Sheet(clan_tag=clan.clan_tag, worksheet=worksheet)
+    targets = {"crapi": client, "sheet": sheet}
+
+    results = []
+    for command, target, method in COMMANDS:
+        if "churn" in command:
+            clan.churn(NUM_CHURN)
+            # Members changed upstream, a kept snapshot would hide it
+            client.clear_snapshot()
+        result = run_command(
+            command, targets[target], method, server, worksheet, client, cold
+        )
+        result["scenario"] = name
+        results.append(result)
+
+    return results
+
+
+def get_response_cache():
+    from crapi import crapi
+
+    return crapi.get_response_cache({})
+
+
+def save_caches():
+    """Save caches of the run while their directory exists."""
+    from crapi import crapi
+
+    get_response_cache().save()
+    crapi.get_profile_cache({}).save()
+
+
+def show_results(results):
+    result_table = table.Table(
+        [
+            table.Column("情境"),
+            table.Column("指令"),
+            table.Column("秒", dir="r"),
+            table.Column("API", dir="r"),
+            table.Column("Sheet", dir="r"),
+            table.Column("明細", shrink=True),
+        ],
+        sep="  ",
+    )
+    for result in results:
+        detail = ", ".join(f"{k} {v}" for k, v in sorted(result["detail"].items()))
+        result_table.add_row(
+            result["scenario"],
+            result["command"],
+            f"{result['seconds']:.3f}",
+            result["api_calls"],
+            result["sheet_calls"],
+            detail,
+        )
+    table.write(result_table.render(rule="="))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="Scenario to run, all by default",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds added per API response"
+    )
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        help="Keep the response cache and clan snapshot between commands",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    names = args.scenario or list(SCENARIOS)
+    clans = {
+        name: ClanData(f"#BENCH{i}", seed=i, **SCENARIOS[name])
+        for i, name in enumerate(names)
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir, StandInServer(
+        clans.values(), latency=args.latency
+    ) as server:
+        os.environ["CRAPI_API_URI"] = server.url
+        os.environ["CRAPI_TOKEN"] = "benchmark"
+        os.environ["CR_HISTORY_PATH"] = os.path.join(tmp_dir, "history.db")
+        # Keep data of the stand-in out of the cache files
+        os.environ["CR_CACHE_DIR"] = tmp_dir
+        for name, clan in clans.items():
+            print(f"Running {name}...", file=sys.stderr)
+            results += run_scenario(name, server, clan, cold=not args.warm)
+        save_caches()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        show_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from utils import datetime_wrapper
+
+
+def get_role(index):
+    """Get role of the member at the index: 1 leader, 3 co-leaders, 6 elders."""
+    if index == 0:
+        return "leader"
+    if index < 4:
+        return "coLeader"
+    if index < 10:
+        return "elder"
+    return "member"
+
+
+def get_page(items, limit=0, after=None):
+    """Get a page of items and its cursors, as paged by the API.
+
+    Cursors are base64 of the position, like {"pos": 10} of the API.
+
+    Examples
+    --------
+    >>> page = get_page(list(range(5)), limit=2)
+    >>> page["items"], page["paging"]["cursors"]["after"]
+    ([0, 1], 'eyJwb3MiOiAyfQ==')
+    >>> get_page(list(range(5)), limit=2, after="eyJwb3MiOiAyfQ==")["items"]
+    [2, 3]
+    >>> get_page(list(range(5)), limit=0)["paging"]["cursors"]
+    {}
+    """
+    start = 0
+    if after:
+        start = json.loads(base64.b64decode(after))["pos"]
+    end = start + limit if limit > 0 else len(items)
+
+    def encode(pos):
+        return base64.b64encode(json.dumps({"pos": pos}).encode()).decode()
+
+    cursors = {}
+    if start > 0:
+        cursors["before"] = encode(start)
+    if end < len(items):
+        cursors["after"] = encode(end)
+    return {"items": items[start:end], "paging": {"cursors": cursors}}
+
+
+# Path pattern -> name of the endpoint, as counted by the server
+ROUTES = (
+    (re.compile(r"^/v1/clans/([^/]+)/members$"), "members"),
+    (re.compile(r"^/v1/clans/([^/]+)/currentriverrace$"), "currentriverrace"),
+    (re.compile(r"^/v1/clans/([^/]+)/riverracelog$"), "riverracelog"),
+    (re.compile(r"^/v1/players/([^/]+)$"), "players"),
+)
+
+
+class ClanData:
+    """Deterministic data of a clan in the shape of the Clash Royale API.
+
+    Parameters
+    ----------
+    clan_tag : str
+        Tag of the clan.
+    num_members : int
+        Number of members.
+    num_races : int
+        Number of races in the racelog.
+    seed : int
+        Seed of the generated numbers.
+    """
+
+    def __init__(self, clan_tag, num_members=50, num_races=10, seed=0):
+        rng = random.Random(seed)
+        now = datetime_wrapper.get_utcnow()
+
+        self.clan_tag = clan_tag
+        self.members = []
+        # Player tags are unique across clans, players are looked up by tag
+        self.__tag_prefix = f"#P{clan_tag.lstrip('#')}"
+        for i in range(num_members):
+            trophies = rng.randint(4000, 7500)
+            self.members.append(
+                {
+                    "tag": f"{self.__tag_prefix}{i:06d}",
+                    "name": f"玩家{i}" if i % 3 == 0 else f"Player {i}",
+                    "role": get_role(i),
+                    "expLevel": rng.randint(30, 60),
+                    "trophies": trophies,
+                    "donations": rng.randint(0, 500),
+                    "donationsReceived": rng.randint(0, 300),
+                    "lastSeen": datetime_wrapper.dt_to_str(
+                        now - timedelta(minutes=rng.randint(1, 60 * 24 * 10))
+                    ),
+                }
+            )
+        self.members.sort(key=lambda m: m["trophies"], reverse=True)
+        for rank, member in enumerate(self.members, start=1):
+            member["clanRank"] = rank
+        self.best_trophies = {
+            m["tag"]: m["trophies"] + rng.randint(0, 500) for m in self.members
+        }
+
+        # Order: later to former, one race a week
+        self.racelog = [
+            self.__make_race(
+                rng, now - timedelta(weeks=i + 1), 100 - i // 4, 3 - i % 4
+            )
+            for i in range(num_races)
+        ]
+        self.current_race = self.__make_current_race(rng)
+
+    def __make_standing_clan(self, rng, tag, name):
+        participants = [
+            {
+                "tag": m["tag"],
+                "name": m["name"],
+                "fame": rng.randint(0, 16) * 100,
+                "repairPoints": 0,
+                "boatAttacks": rng.randint(0, 2),
+                "decksUsed": rng.randint(0, 16),
+                "decksUsedToday": rng.randint(0, 4),
+            }
+            for m in self.members
+            if tag == self.clan_tag
+        ]
+        return {
+            "tag": tag,
+            "name": name,
+            "clanScore": rng.randint(2000, 4000),
+            "fame": sum(p["fame"] for p in participants) or rng.randint(0, 50000),
+            "participants": participants,
+        }
+
+    def __make_race(self, rng, created, season_id, section_index):
+        clans = [self.__make_standing_clan(rng, self.clan_tag, "Our Clan")]
+        clans += [
+            self.__make_standing_clan(rng, f"#C{i:06d}", f"Clan {i}")
+            for i in range(4)
+        ]
+        standings = []
+        for rank, clan in enumerate(clans, start=1):
+            clan["finishTime"] = datetime_wrapper.dt_to_str(
+                created - timedelta(days=1, hours=rank)
+            )
+            standings.append(
+                {"rank": rank, "trophyChange": 100 - 50 * (rank - 1), "clan": clan}
+            )
+        rng.shuffle(standings)
+        return {
+            "seasonId": season_id,
+            "sectionIndex": section_index,
+            "createdDate": datetime_wrapper.dt_to_str(created),
+            "standings": standings,
+        }
+
+    def __make_current_race(self, rng):
+        # Nobody has finished the current race
+        clan = self.__make_standing_clan(rng, self.clan_tag, "Our Clan")
+        others = [
+            self.__make_standing_clan(rng, f"#C{i:06d}", f"Clan {i}")
+            for i in range(4)
+        ]
+        return {"sectionIndex": 0, "clan": clan, "clans": others + [clan]}
+
+    def churn(self, number):
+        """Replace the lowest members with new ones, as members leave and join."""
+        rng = random.Random(len(self.best_trophies))
+        del self.members[len(self.members) - number :]
+        for i in range(number):
+            tag = f"{self.__tag_prefix}N{len(self.best_trophies):06d}"
+            trophies = rng.randint(4000, 7500)
+            self.members.append(
+                {
+                    "tag": tag,
+                    "name": f"New {i}",
+                    "role": "member",
+                    "expLevel": rng.randint(30, 60),
+                    "trophies": trophies,
+                    "clanRank": len(self.members) + 1,
+                    "donations": 0,
+                    "donationsReceived": 0,
+                    "lastSeen": datetime_wrapper.get_utcnow_str(),
+                }
+            )
+            self.best_trophies[tag] = trophies
+
+    def get_player(self, tag):
+        for member in self.members:
+            if member["tag"] == tag:
+                return {
+                    "tag": tag,
+                    "name": member["name"],
+                    "trophies": member["trophies"],
+                    "bestTrophies": self.best_trophies[tag],
+                }
+        return None
+
+
+class StandInServer:
+    """Local HTTP stand-in of the Clash Royale API.
+
+    Serves members, players, current river race and racelog of generated
+    clans under "/v1", with a fixed latency added to each response. Requests
+    are counted by endpoint.
+
+    Parameters
+    ----------
+    clans : list
+        ClanData of the served clans.
+    latency : float
+        Seconds slept before each response.
+    """
+
+    def __init__(self, clans, latency=0.0):
+        self.clans = {clan.clan_tag: clan for clan in clans}
+        self.latency = latency
+        self.counts = Counter()
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(("127.0.0.1", 0), self.__make_handler())
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+    @property
+    def url(self):
+        host, port = self.__server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def reset_counts(self):
+        with self.__lock:
+            self.counts.clear()
+
+    def __count(self, name):
+        with self.__lock:
+            self.counts[name] += 1
+
+    def respond(self, path, query):
+        """Get status and payload of a request."""
+        for pattern, name in ROUTES:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            return 404, {"reason": "notFound"}
+
+        self.__count(name)
+        tag = unquote(match.group(1))
+        if name == "players":
+            for clan in self.clans.values():
+                player = clan.get_player(tag)
+                if player:
+                    return 200, player
+            return 404, {"reason": "notFound"}
+
+        clan = self.clans.get(tag)
+        if clan is None:
+            return 404, {"reason": "notFound"}
+        if name == "members":
+            return 200, {"items": clan.members, "paging": {"cursors": {}}}
+        if name == "currentriverrace":
+            return 200, clan.current_race
+        limit = int(query.get("limit", ["0"])[0])
+        after = query.get("after", [None])[0]
+        return 200, get_page(clan.racelog, limit=limit, after=after)
+
+    def __make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlsplit(self.path)
+                status, payload = server.respond(url.path, parse_qs(url.query))
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Keep benchmark output clean
+                pass
+
+        return Handler
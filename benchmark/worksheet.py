@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import Counter
+
+
+def _format_number(number):
+    """Format a number as shown by Sheets.
+
+    Examples
+    --------
+    >>> _format_number(5000.0)
+    '5000'
+
+    >>> _format_number(1.5)
+    '1.5'
+    """
+    if float(number).is_integer():
+        return str(int(number))
+    return str(number)
+
+
+def _from_extended_value(value):
+    """Convert Sheets API ExtendedValue to the displayed string."""
+    if "numberValue" in value:
+        return _format_number(value["numberValue"])
+    if "boolValue" in value:
+        return "TRUE" if value["boolValue"] else "FALSE"
+    return str(next(iter(value.values()), ""))
+
+
+def _to_extended_value(value):
+    """Convert a displayed string to the ExtendedValue it was entered as."""
+    try:
+        return {"numberValue": float(value)}
+    except ValueError:
+        return {"stringValue": value}
+
+
+def _sort_key(value):
+    """Sort numbers before text, like Sheets does in descending order."""
+    try:
+        return (1, float(value))
+    except ValueError:
+        return (0, 0.0) if value == "" else (0.5, 0.0)
+
+
+class Calls:
+    """Counter of worksheet calls shared by a fake worksheet and its client."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.__lock = threading.Lock()
+
+    def count(self, name):
+        with self.__lock:
+            self.counts[name] += 1
+
+    def reset(self):
+        with self.__lock:
+            self.counts.clear()
+
+    def total(self):
+        return sum(self.counts.values())
+
+
+class FakeSheetsService:
+    """Fake of pygsheets SheetAPIWrapper, serving one fake worksheet."""
+
+    def __init__(self, worksheet, calls):
+        self.__worksheet = worksheet
+        self.__calls = calls
+
+    def get(self, spreadsheet_id, **kwargs):
+        self.__calls.count("sheet.get")
+        return self.__worksheet.get_grid_data()
+
+    def batch_update(self, spreadsheet_id, requests, **kwargs):
+        self.__calls.count("sheet.batch_update")
+        for request in requests:
+            self.__worksheet.apply(request)
+        return {"replies": [{} for _ in requests]}
+
+
+class FakeClient:
+    def __init__(self, worksheet, calls):
+        self.sheet = FakeSheetsService(worksheet, calls)
+
+
+class FakeSpreadsheet:
+    def __init__(self, spreadsheet_id):
+        self.id = spreadsheet_id
+
+
+class FakeWorksheet:
+    """In-memory fake of pygsheets.Worksheet counting remote calls.
+
+    Only the calls used by spreadsheet.Sheet are provided. Values are kept
+    as displayed strings, notes and background colors by cell.
+
+    Parameters
+    ----------
+    rows : int
+        Number of rows.
+    cols : int
+        Number of columns.
+    title : str
+        Title of the worksheet.
+    """
+
+    def __init__(self, rows=100, cols=26, title="Sheet1"):
+        self.calls = Calls()
+        self.title = title
+        self.id = 0
+        self.spreadsheet = FakeSpreadsheet("fake-spreadsheet")
+        self.client = FakeClient(self, self.calls)
+        self.__rows = rows
+        self.__cols = cols
+        # (row, col) -> value / note / color, starts from 1
+        self.__values = {}
+        self.__notes = {}
+        self.__colors = {}
+        self.__frozen_cols = 0
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def cols(self):
+        return self.__cols
+
+    @property
+    def frozen_cols(self):
+        return self.__frozen_cols
+
+    @frozen_cols.setter
+    def frozen_cols(self, value):
+        self.calls.count("frozen_cols")
+        self.__frozen_cols = value
+
+    def get_value(self, row, col):
+        return self.__values.get((row, col), "")
+
+    def get_all_values(
+        self, include_tailing_empty=True, include_tailing_empty_rows=True, **kwargs
+    ):
+        self.calls.count("get_all_values")
+        last_row = self.__rows
+        if not include_tailing_empty_rows:
+            last_row = max((row for row, _ in self.__values), default=0)
+        matrix = []
+        for row in range(1, last_row + 1):
+            values = [self.get_value(row, col) for col in range(1, self.__cols + 1)]
+            if not include_tailing_empty:
+                while values and values[-1] == "":
+                    values.pop()
+            matrix.append(values)
+        return matrix
+
+    def get_grid_data(self):
+        """Get values, notes and colors in the shape of spreadsheets.get."""
+        last_row = max((row for row, _ in self.__values), default=0)
+        row_data = []
+        for row in range(1, last_row + 1):
+            values = []
+            for col in range(1, self.__cols + 1):
+                cell = {}
+                if (row, col) in self.__values:
+                    cell["userEnteredValue"] = _to_extended_value(
+                        self.__values[(row, col)]
+                    )
+                if (row, col) in self.__notes:
+                    cell["note"] = self.__notes[(row, col)]
+                if (row, col) in self.__colors:
+                    red, green, blue, alpha = self.__colors[(row, col)]
+                    cell["userEnteredFormat"] = {
+                        "backgroundColor": {
+                            "red": red,
+                            "green": green,
+                            "blue": blue,
+                            "alpha": alpha,
+                        }
+                    }
+                values.append(cell)
+            row_data.append({"values": values})
+        return {"sheets": [{"data": [{"rowData": row_data}]}]}
+
+    def __cells(self):
+        return (self.__values, self.__notes, self.__colors)
+
+    def __shift(self, axis, index, delta):
+        """Move cells at or after the index (starts from 1) along an axis."""
+        for cells in self.__cells():
+            shifted = {}
+            for pos, data in cells.items():
+                if pos[axis] >= index:
+                    if delta < 0 and pos[axis] < index - delta:
+                        continue
+                    pos = list(pos)
+                    pos[axis] += delta
+                    pos = tuple(pos)
+                shifted[pos] = data
+            cells.clear()
+            cells.update(shifted)
+
+    def insert_rows(self, row, number=1, values=None, inherit=False):
+        self.calls.count("insert_rows")
+        self.__shift(0, row + 1, number)
+        self.__rows += number
+
+    def insert_cols(self, col, number=1, values=None, inherit=False):
+        self.calls.count("insert_cols")
+        self.__shift(1, col + 1, number)
+        self.__cols += number
+
+    def delete_rows(self, index, number=1):
+        self.calls.count("delete_rows")
+        self.__shift(0, index, -number)
+        self.__rows -= number
+
+    def sort_range(self, start, end, basecolumnindex=0, sortorder="ASCENDING"):
+        self.calls.count("sort_range")
+        (row_start, col_start), (row_end, col_end) = start, end
+        rows = list(range(row_start, row_end + 1))
+        cols = range(col_start, col_end + 1)
+        key_col = basecolumnindex + 1
+        order = sorted(
+            rows,
+            key=lambda row: _sort_key(self.get_value(row, key_col)),
+            reverse=sortorder == "DESCENDING",
+        )
+        for cells in self.__cells():
+            moved = {
+                (new_row, col): cells.pop((old_row, col))
+                for new_row, old_row in zip(rows, order)
+                for col in cols
+                if (old_row, col) in cells
+            }
+            cells.update(moved)
+
+    def adjust_column_width(self, start, end=None, pixel_size=None):
+        self.calls.count("adjust_column_width")
+
+    def __grid_positions(self, grid_range):
+        for row in range(grid_range["startRowIndex"], grid_range["endRowIndex"]):
+            for col in range(
+                grid_range["startColumnIndex"], grid_range["endColumnIndex"]
+            ):
+                yield row + 1, col + 1
+
+    def __set_cell(self, pos, cell_data, fields):
+        if "userEnteredValue" in fields:
+            value = cell_data.get("userEnteredValue")
+            if value is None:
+                self.__values.pop(pos, None)
+            else:
+                self.__values[pos] = _from_extended_value(value)
+        if "note" in fields:
+            if cell_data.get("note"):
+                self.__notes[pos] = cell_data["note"]
+            else:
+                self.__notes.pop(pos, None)
+        if "backgroundColor" in fields:
+            color = cell_data.get("userEnteredFormat", {}).get("backgroundColor")
+            if color is None:
+                self.__colors.pop(pos, None)
+            else:
+                self.__colors[pos] = tuple(
+                    color.get(key, 0) for key in ("red", "green", "blue", "alpha")
+                )
+
+    def __apply_dimension(self, dim_range, sign):
+        axis = 0 if dim_range["dimension"] == "ROWS" else 1
+        number = dim_range["endIndex"] - dim_range["startIndex"]
+        # Inserted after, or deleted from, the 0-based start index
+        self.__shift(axis, dim_range["startIndex"] + 1, sign * number)
+        if axis == 0:
+            self.__rows += sign * number
+        else:
+            self.__cols += sign * number
+
+    def apply(self, request):
+        """Apply a request of spreadsheets.batchUpdate."""
+        if "updateCells" in request:
+            body = request["updateCells"]
+            grid_range = body["range"]
+            cell_data = [
+                cell for row in body["rows"] for cell in row.get("values", [])
+            ]
+            for pos, cell in zip(self.__grid_positions(grid_range), cell_data):
+                self.__set_cell(pos, cell, body["fields"])
+        elif "repeatCell" in request:
+            body = request["repeatCell"]
+            for pos in self.__grid_positions(body["range"]):
+                self.__set_cell(pos, body["cell"], body["fields"])
+        elif "insertDimension" in request:
+            self.__apply_dimension(request["insertDimension"]["range"], 1)
+        elif "deleteDimension" in request:
+            self.__apply_dimension(request["deleteDimension"]["range"], -1)
+        else:
+            raise ValueError(f"Unsupported request: {list(request)}")
+
+    def __repr__(self):
+        return f"<FakeWorksheet {self.title!r} {self.__rows}x{self.__cols}>"
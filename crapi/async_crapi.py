@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from urllib.parse import quote_plus
+
+from utils import metrics
+from utils.async_api import AsyncAPI
+
+
+class AsyncCRAPI:
+    """Asyncio facade of CRAPI.
+
+    Requests of one facade share a single connection pool, so members,
+    player profiles, current river race and racelog can be gathered in one
+    event loop pass. Use it as an async context manager, or through the thin
+    synchronous wrappers of CRAPI.
+
+    Parameters
+    ----------
+    url : str
+        Base URL of the API, version included.
+    clan_tag : str
+        Tag of the clan.
+    keys : crapi.keys.KeyManager
+        Key manager shared with the synchronous client, so both use one
+        token and one single-flight refresh.
+    max_connections : int
+        Maximum number of in-flight requests.
+    cache : utils.cache.ResponseCache
+        Response cache shared with the synchronous client.
+    profiles : crapi.profiles.ProfileCache
+        Best trophies of players, so only changed profiles are fetched.
+    retry : dictionary
+        "retry" section of crapi.json.
+    deadline : float
+        Time budget (seconds) of a request, retries included.
+    """
+
+    def __init__(
+        self,
+        url,
+        clan_tag,
+        keys,
+        max_connections=10,
+        cache=None,
+        retry=None,
+        deadline=None,
+        profiles=None,
+    ):
+        retry = retry or {}
+        self.__api = AsyncAPI(max_connections=max_connections)
+        self.__api.set_url(url)
+        self.__api.set_cache(cache)
+        self.__api.set_retry(
+            max_retries=retry.get("max_retries"),
+            base_delay=retry.get("base_delay"),
+            max_delay=retry.get("max_delay"),
+        )
+        if deadline:
+            self.__api.set_deadline(deadline)
+        self.__clan_tag = clan_tag
+        self.__profiles = profiles
+        self.__keys = keys
+        self.__refresh_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.__api.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.__api.close()
+
+    async def __refresh(self, token):
+        """Refresh the rejected token, return whether a new one is available."""
+        async with self.__refresh_lock:
+            # Requests rejected together wait here, the key manager skips the
+            # refresh when the token was replaced already
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, metrics.bind(self.__keys.refresh), token
+            )
+
+    async def send_req(self, query):
+        with metrics.timer(f"crapi {metrics.get_endpoint(query)}"):
+            return await self.__send_req(query)
+
+    async def __send_req(self, query):
+        # Retry once with a new token if the current one is rejected
+        for retry in (False, True):
+            # The token sent is the one reported if rejected, even if another
+            # client replaces it meanwhile
+            token = self.__keys.get_token()
+            try:
+                return await self.__api.GET(query, jwt=token)
+            except Exception as e:
+                if len(e.args) != 2:
+                    # Connection error or timeout after all retries
+                    metrics.incr("crapi.errors")
+                    print(f"API request ({query}) error: {e}")
+                    return None
+                status, payload = e.args
+                if status == 403 and not retry:
+                    metrics.incr("crapi.token_rejected")
+                    if await self.__refresh(token):
+                        continue
+
+                metrics.incr("crapi.errors")
+                print(
+                    f"API request ({query}) error:\n"
+                    f"  Status: {status}\n"
+                    f"  Response: {payload}\n"
+                )
+                return None
+
+    async def get_members(self):
+        query = f"/clans/{quote_plus(self.__clan_tag)}/members"
+        try:
+            resp = await self.send_req(query)
+        except Exception as e:
+            print("Error: Unable to retrieve member list", e)
+            return None
+
+        return resp["items"] if resp else None
+
+    async def get_player(self, tag):
+        query = f"/players/{quote_plus(tag)}"
+        return await self.send_req(query)
+
+    async def get_players(self, tags):
+        """Get profiles of players concurrently.
+
+        Returns
+        -------
+        players : dictionary
+            Use tag as key, player as value.
+        failed_tags : list
+            Tags of the players failed to retrieve, in the given order.
+        """
+        results = await asyncio.gather(
+            *(self.get_player(tag) for tag in tags), return_exceptions=True
+        )
+
+        players = {}
+        failed_tags = []
+        for tag, player in zip(tags, results):
+            if isinstance(player, Exception):
+                print(f"Error: Unable to retrieve player {tag}", player)
+                player = None
+            if player:
+                players[tag] = player
+            else:
+                failed_tags.append(tag)
+
+        return players, failed_tags
+
+    async def get_members_dic(self):
+        """Get members of the clan with "bestTrophies" of each player.
+
+        With a profile cache, only profiles which may have changed are
+        fetched, the others keep their cached best trophies.
+
+        Returns
+        -------
+        members : dictionary
+            Use tag as key, member as value. None if the list is unavailable.
+        """
+        members = await self.get_members()
+        if members is None:
+            print("Error: Unable to retrieve member list")
+            return None
+        if not members:
+            return {}
+
+        profiles = self.__profiles
+        if profiles:
+            tags = profiles.get_stale_tags(members)
+            metrics.incr("profiles.hit", len(members) - len(tags))
+            metrics.incr("profiles.miss", len(tags))
+        else:
+            tags = [member["tag"] for member in members]
+        players, failed_tags = await self.get_players(tags)
+
+        hash_members = {}
+        for member in members:
+            tag = member["tag"]
+            player = players.get(tag)
+            # Add field "bestTrophies" to each member
+            if player:
+                member["bestTrophies"] = player["bestTrophies"]
+                if profiles:
+                    profiles.put(player)
+            elif profiles and profiles.get_best_trophies(tag) is not None:
+                # Not fetched, or failed with a cached value to fall back to
+                member["bestTrophies"] = profiles.get_best_trophies(tag)
+            hash_members[tag] = member
+
+        for tag in failed_tags:
+            if "bestTrophies" in hash_members[tag]:
+                continue
+            name = hash_members[tag]["name"]
+            print(f"Warning: Unable to retrieve best trophies of {name} ({tag})")
+
+        return hash_members
+
+    async def get_current_race(self):
+        query = f"/clans/{quote_plus(self.__clan_tag)}/currentriverrace"
+        return await self.send_req(query)
+
+    async def get_racelog(self, limit=0):
+        query = f"/clans/{quote_plus(self.__clan_tag)}/riverracelog" + (
+            f"?limit={limit}" if limit > 0 else ""
+        )
+        resp = await self.send_req(query)
+        return resp["items"] if resp else None
+
+    async def gather_all(self):
+        """Get members, player profiles, current race and racelog at once.
+
+        Returns
+        -------
+        data : dictionary
+            "members" (as get_members_dic), "race" and "racelog".
+        """
+        members, race, racelog = await asyncio.gather(
+            self.get_members_dic(), self.get_current_race(), self.get_racelog()
+        )
+        return {"members": members, "race": race, "racelog": racelog}
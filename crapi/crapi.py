@@ -1,50 +1,146 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
 import importlib.resources
+import itertools
 import json
 import os
-from datetime import datetime
+import threading
 from urllib.parse import quote_plus
 
-from dotenv import load_dotenv, set_key
+from dotenv import load_dotenv
 
-from utils import alignment, api, datetime_wrapper, singleton
+from utils import api, cache, datetime_wrapper, metrics, ratelimit, singleton, table
 
-align = alignment.align
+from . import keys, profiles
+from .async_crapi import AsyncCRAPI
+from .snapshot import ClanSnapshot
+
+Column = table.Column
 
 API = api.API
-ENV_PATH = ".env"
+DEFAULT_MAX_WORKERS = 10
+DEFAULT_SNAPSHOT_MAX_AGE = 60
+DEFAULT_RACELOG_PAGE_SIZE = 10
+# Participants shown side by side in a race
+NUM_PARTICIPANT_COLUMNS = 2
+
+# Shared by every client of the process, created on first use
+_response_cache = None
+_profile_cache = None
+
+
+def get_response_cache(cache_config):
+    """Get the response cache of the process.
+
+    Parameters
+    ----------
+    cache_config : dictionary
+        "cache" section of crapi.json.
+    """
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = cache.ResponseCache(
+            ttls=cache_config.get("ttl"),
+            max_entries=cache_config.get("max_entries") or cache.DEFAULT_MAX_ENTRIES,
+            path=cache.get_cache_path(cache_config.get("path")),
+        )
+    return _response_cache
+
+
+def get_profile_cache(profiles_config):
+    """Get the player profile cache of the process.
+
+    Parameters
+    ----------
+    profiles_config : dictionary
+        "profiles" section of crapi.json.
+    """
+    global _profile_cache
+    if _profile_cache is None:
+        _profile_cache = profiles.ProfileCache(
+            path=cache.get_cache_path(profiles_config.get("path")),
+            max_age=profiles_config.get("max_age") or profiles.DEFAULT_MAX_AGE,
+        )
+    return _profile_cache
 
 
 class CRAPI(metaclass=singleton.Singleton):
-    def __init__(self):
+    def __init__(self, clan_tag=None):
+        """Setup client of a clan.
+
+        Parameters
+        ----------
+        clan_tag : str
+            Tag of the clan, defaults to env "CR_CLAN_TAG".
+        """
         load_dotenv(override=True)
         # with open(config.CRAPI_PATH) as api_file:
         with importlib.resources.open_text("config", "crapi.json") as api_file:
             api_config = json.load(api_file)
             api_file.close()
-        uri = api_config["api_uri"] or ""
+        # Env "CRAPI_API_URI" points the client to another server, e.g. a stand-in
+        uri = os.environ.get("CRAPI_API_URI") or api_config["api_uri"] or ""
         ver = api_config["version"] or "v1"
         jwt = os.environ.get("CRAPI_TOKEN") or ""
 
+        self.__api_config = api_config
+        self.__url = f"{uri}/{ver}"
         self.__api = API()
-        self.__api.set_url(f"{uri}/{ver}")
+        self.__api.set_url(self.__url)
         self.__api.set_jwt(jwt)
+        # Refreshed keys are swapped into the session of this client
+        self.__keys = keys.get_key_manager(api_config)
+        self.__keys.add_listener(self.__api.set_jwt)
+        if api_config.get("cache"):
+            self.__api.set_cache(get_response_cache(api_config["cache"]))
+        retry_config = api_config.get("retry") or {}
+        self.__api.set_retry(
+            max_retries=retry_config.get("max_retries"),
+            base_delay=retry_config.get("base_delay"),
+            max_delay=retry_config.get("max_delay"),
+        )
+        if api_config.get("deadline"):
+            self.__api.set_deadline(api_config["deadline"])
+        for host, limit in (api_config.get("rate_limit") or {}).items():
+            # Keep the bucket (and its tokens) when the client is re-created
+            if ratelimit.get_bucket(host) is None:
+                ratelimit.set_rate_limit(host, limit["rate"], limit.get("burst"))
+
+        self.__max_workers = api_config.get("max_workers") or DEFAULT_MAX_WORKERS
+        self.__snapshot_max_age = api_config.get(
+            "snapshot_max_age", DEFAULT_SNAPSHOT_MAX_AGE
+        )
+        self.__racelog_page_size = (
+            api_config.get("racelog_page_size") or DEFAULT_RACELOG_PAGE_SIZE
+        )
+        self.__snapshot = None
+        self.__snapshot_lock = threading.Lock()
 
-        self.__clan_tag = os.environ.get("CR_CLAN_TAG") or ""
+        self.__clan_tag = clan_tag or os.environ.get("CR_CLAN_TAG") or ""
 
     def __send_req(self, query):
-        def send_query(retry=False):
+        with metrics.timer(f"crapi {metrics.get_endpoint(query)}"):
+            return self.__send_req_once(query)
+
+    def __send_req_once(self, query):
+        # Replace the key ahead of time if the external IP has changed
+        self.__keys.ensure_valid()
+        # Retry once with a new token if the current one is rejected
+        for retry in (False, True):
+            token = self.__keys.get_token()
             try:
                 resp = self.__api.GET(query)
                 return resp
             except Exception as e:
                 status, payload = e.args
                 if status == 403 and not retry:
-                    self.refresh_token()
-                    self.__init__()
-                    return send_query(retry=True)
+                    metrics.incr("crapi.token_rejected")
+                    # Requests rejected with the same token share one refresh
+                    if self.__keys.refresh(rejected_token=token):
+                        continue
 
+                metrics.incr("crapi.errors")
                 if isinstance(payload, dict):
                     print(
                         f"API request ({query}) error:\n"
@@ -57,64 +153,22 @@ class CRAPI(metaclass=singleton.Singleton):
                         f"  Status: {status}\n"
                         f"  Response: {payload.text}\n"
                     )
+                return None
 
-        return send_query()
-
-    def refresh_token(self):
-        with importlib.resources.open_text("config", "crapi.json") as api_file:
-            api_config = json.load(api_file)
-            api_file.close()
-        uri = api_config["dev_uri"] or ""
-        email = os.environ.get("CRAPI_EMAIL")
-        password = os.environ.get("CRAPI_PASSWORD")
-
-        dev_api = API()
-        dev_api.set_url(uri)
-
-        try:
-            resp = dev_api.POST(
-                "/login", json.dumps({"email": email, "password": password})
-            )
+    def refresh_token(self, rejected_token=None):
+        """Replace the API key, shared by all clients of the process.
 
-            date = datetime.today().strftime("%Y%m%d")
-            source_ip = dev_api.get_external_ip()
-
-            resp = dev_api.POST("/apikey/list")
-            keys = resp["keys"]
-            if keys and len(keys) >= 10:
-                latest_key = keys[-1]
-                resp = dev_api.POST(
-                    "/apikey/revoke", json.dumps({"id": latest_key["id"]})
-                )
-
-            resp = dev_api.POST(
-                "/apikey/create",
-                json.dumps(
-                    {
-                        "name": f"CR Manager {date}",
-                        "description": "For single IP address",
-                        "cidrRanges": [source_ip],
-                        "scopes": None,
-                    }
-                ),
-            )
-            set_key(ENV_PATH, key_to_set="CRAPI_TOKEN", value_to_set=resp["key"]["key"])
-            self.__init__()
+        Parameters
+        ----------
+        rejected_token : str
+            Token which was rejected, skip if it has been replaced already.
 
-        except Exception as e:
-            status, payload = e.args
-            if isinstance(payload, dict):
-                print(
-                    "Refresh request error:\n"
-                    f"  Status: {status}\n"
-                    f"  Response: {payload}\n"
-                )
-            else:
-                print(
-                    "Refresh request error:\n"
-                    f"  Status: {status}\n"
-                    f"  Response: {payload.text}\n"
-                )
+        Returns
+        -------
+        refreshed : bool
+            Whether a valid new token is available.
+        """
+        return self.__keys.refresh(rejected_token=rejected_token)
 
     def get_clan_tag(self):
         return self.__clan_tag
@@ -136,39 +190,163 @@ class CRAPI(metaclass=singleton.Singleton):
 
         return members
 
-    def get_members_dic(self):
+    def run_async(self, func, max_workers=None):
+        """Run a coroutine function with an AsyncCRAPI in a new event loop.
+
+        Parameters
+        ----------
+        func : callable
+            Coroutine function taking the AsyncCRAPI.
+        max_workers : int
+            Maximum number of in-flight requests (default from config).
+
+        Returns
+        -------
+        result : object
+            Result of the coroutine.
+        """
+        api_config = self.__api_config
+
+        async def run():
+            # Replace the key once before the requests, instead of every
+            # concurrent request being rejected after an IP change
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, metrics.bind(self.__keys.ensure_valid))
+            async with AsyncCRAPI(
+                self.__url,
+                self.__clan_tag,
+                self.__keys,
+                max_connections=max_workers or self.__max_workers,
+                cache=(
+                    get_response_cache(api_config["cache"])
+                    if api_config.get("cache")
+                    else None
+                ),
+                retry=api_config.get("retry"),
+                deadline=api_config.get("deadline"),
+                profiles=(
+                    get_profile_cache(api_config["profiles"])
+                    if api_config.get("profiles")
+                    else None
+                ),
+            ) as client:
+                return await func(client)
+
+        return asyncio.run(run())
+
+    def get_members_dic(self, max_workers=None):
         """Get members of the clan.
 
+        Player profiles are requested concurrently. Members whose profile
+        could not be retrieved are reported and left without "bestTrophies".
+
+        Parameters
+        ----------
+        max_workers : int
+            Maximum number of in-flight player requests (default from config).
+
         Returns
         -------
         members : dictionary
             Use tag as key, member as value.
         """
-        query = f"/clans/{quote_plus(self.__clan_tag)}/members"
-        try:
-            resp = self.__send_req(query)
-            members = resp["items"] if resp else None
-        except Exception:
-            print("Error: Unable to retrieve member list")
-            return None
+        return self.run_async(
+            lambda client: client.get_members_dic(), max_workers=max_workers
+        )
 
-        if not members:
-            return {}
-        hash_members = {}
+    def get_players(self, tags, max_workers=None):
+        """Get profiles of players concurrently.
 
-        for member in members:
-            tag = member["tag"]
-            query = f"/players/{quote_plus(tag)}"
-            player = self.__send_req(query)
-            # Add field "bestTrophies" to each member
-            if player:
-                member["bestTrophies"] = player["bestTrophies"]
-            hash_members[tag] = member
+        Parameters
+        ----------
+        tags : list
+            Tags of the players.
+        max_workers : int
+            Maximum number of in-flight requests (default from config).
+
+        Returns
+        -------
+        players : dictionary
+            Use tag as key, player as value.
+        failed_tags : list
+            Tags of the players failed to retrieve, in the given order.
+        """
+        return self.run_async(
+            lambda client: client.get_players(tags), max_workers=max_workers
+        )
+
+    def fetch_all(self, max_workers=None):
+        """Get members, player profiles, current race and racelog at once.
+
+        Returns
+        -------
+        data : dictionary
+            "members" (as get_members_dic), "race" and "racelog".
+        """
+        return self.run_async(
+            lambda client: client.gather_all(), max_workers=max_workers
+        )
+
+    def get_snapshot(self, max_age=None, refresh=False):
+        """Get a snapshot of the clan shared by commands while it is fresh.
+
+        Concurrent callers wait for one fetch. Snapshots missing any part
+        are returned but not kept, so the next call fetches again.
+
+        Parameters
+        ----------
+        max_age : float
+            Freshness window in seconds (default "snapshot_max_age" in config).
+        refresh : bool
+            Fetch a new snapshot even if the kept one is fresh.
+
+        Returns
+        -------
+        snapshot : ClanSnapshot
+        """
+        if max_age is None:
+            max_age = self.__snapshot_max_age
+
+        with self.__snapshot_lock:
+            snapshot = self.__snapshot
+            if not refresh and snapshot is not None and snapshot.is_fresh(max_age):
+                metrics.incr("snapshot.hit")
+                return snapshot
+
+            metrics.incr("snapshot.fetch")
+            data = self.fetch_all()
+            snapshot = ClanSnapshot(data["members"], data["race"], data["racelog"])
+            if snapshot.is_complete():
+                self.__snapshot = snapshot
+            return snapshot
+
+    def get_fresh_snapshot(self, max_age=None):
+        """Get the kept snapshot without fetching, None if absent or stale.
+
+        Commands needing one part of the clan use it when available, and
+        request only that part otherwise.
+        """
+        if max_age is None:
+            max_age = self.__snapshot_max_age
 
-        return hash_members
+        with self.__snapshot_lock:
+            snapshot = self.__snapshot
+            if snapshot is None or not snapshot.is_fresh(max_age):
+                return None
+            metrics.incr("snapshot.hit")
+            return snapshot
+
+    def clear_snapshot(self):
+        """Drop the kept snapshot, the next command fetches again."""
+        with self.__snapshot_lock:
+            self.__snapshot = None
 
     def show_members(self):
-        members = self.get_members()
+        snapshot = self.get_fresh_snapshot()
+        if snapshot is not None:
+            members = snapshot.get_member_list()
+        else:
+            members = self.get_members()
 
         if not members or len(members) == 0:
             print("沒有可顯示的成員")
@@ -176,15 +354,16 @@ class CRAPI(metaclass=singleton.Singleton):
 
         now = datetime_wrapper.get_utcnow()
 
-        print(f"部落成員，共 {len(members)} 名")
-        print(
-            f"{align('排名', length=6)}"
-            f"{align('名字', length=32)}"
-            f"{align('職位', length=6)}"
-            f"{align('獎盃', length=6)}"
-            f"{align('上線', length=6, dir='r')}"
+        member_table = table.Table(
+            [
+                Column("排名", min_width=4),
+                Column("名字", shrink=True),
+                Column("職位"),
+                Column("獎盃", dir="r"),
+                Column("上線", dir="r"),
+            ],
+            sep="  ",
         )
-        print("=" * 56)
         num_leader = num_coleader = num_elder = 0
         for member in members:
             name = member["name"]
@@ -210,19 +389,41 @@ class CRAPI(metaclass=singleton.Singleton):
             except Exception:
                 last_seen = ""
 
-            clan_rank = str(member["clanRank"])
-            trophies = str(member["trophies"])
-
-            print(
-                f"{align(clan_rank, length=6)}"
-                f"{align(name, length=32)}"
-                f"{align(role, length=6)}"
-                f"{align(trophies, length=6)}"
-                f"{align(last_seen, length=6, dir='r')}"
+            member_table.add_row(
+                member["clanRank"], name, role, member["trophies"], last_seen
             )
-        print(f"首領:{align(str(num_leader), length=6, dir='r')} 位")
-        print(f"副首:{align(str(num_coleader), length=6, dir='r')} 位")
-        print(f"長老:{align(str(num_elder), length=6, dir='r')} 位")
+
+        lines = [f"部落成員，共 {len(members)} 名"]
+        lines += member_table.render(rule="=")
+        lines += [
+            f"首領: {num_leader:>5} 位",
+            f"副首: {num_coleader:>5} 位",
+            f"長老: {num_elder:>5} 位",
+        ]
+        table.write(lines)
+
+    @staticmethod
+    def __get_participant_lines(participants):
+        """Render participants side by side, sorted by fame.
+
+        Returns
+        -------
+        lines : list
+            Lines of "name (fame / decks used)".
+        """
+        participants = sorted(participants, key=lambda p: p["fame"], reverse=True)
+        participant_table = table.Table(
+            [Column(shrink=True), Column(dir="r")] * NUM_PARTICIPANT_COLUMNS,
+            sep="  ",
+            indent="  ",
+        )
+        for i in range(0, len(participants), NUM_PARTICIPANT_COLUMNS):
+            cells = []
+            for p in participants[i : i + NUM_PARTICIPANT_COLUMNS]:
+                cells += [p["name"], f"({p['fame']} / {p['decksUsed']})"]
+            participant_table.add_row(*cells)
+
+        return ["名單 (名譽/次數)："] + participant_table.render()
 
     def show_race(self):
         """Show current river race of the clan.
@@ -232,8 +433,8 @@ class CRAPI(metaclass=singleton.Singleton):
         warlog : list
             Order: later to former.
         """
-        query = f"/clans/{quote_plus(self.__clan_tag)}/currentriverrace"
-        race = self.__send_req(query)
+        snapshot = self.get_fresh_snapshot()
+        race = snapshot.race if snapshot is not None else self.get_current_race()
 
         if not race:
             print("沒有正在進行的部落戰")
@@ -242,22 +443,18 @@ class CRAPI(metaclass=singleton.Singleton):
         section_idx = race["sectionIndex"]
         week_idx = section_idx + 1
 
-        clans = race["clans"]
-        # Show other clans
-        print(f"河流競賽 Week {week_idx}")
-        print(
-            f"{align('部落 (獎盃)', length=24)}"
-            f"{align('名譽值', length=8, dir='r')}"
-            f"{align('完成時間', length=12, dir='r')}"
+        race_table = table.Table(
+            [
+                Column("部落 (獎盃)", shrink=True),
+                Column("名譽值", dir="r"),
+                Column("完成時間", dir="r"),
+            ],
+            sep="  ",
         )
-        print("=" * 56)
+        # Other clans first, then our clan
+        clans = [clan for clan in race["clans"] if clan["tag"] != self.__clan_tag]
+        clans.append(race["clan"])
         for clan in clans:
-            if clan["tag"] == self.__clan_tag:
-                # Skip our clan
-                continue
-            name = clan["name"]
-            score = str(clan["clanScore"])
-            fame = str(clan["fame"])
             try:
                 finish_time = datetime_wrapper.get_date_str(
                     datetime_wrapper.utc_to_local(
@@ -266,48 +463,33 @@ class CRAPI(metaclass=singleton.Singleton):
                 )
             except Exception:
                 finish_time = "未完成"
-            print(
-                f"{align(f'{name} ({score})', length=24)}"
-                f"{align(fame, length=8, dir='r')}"
-                f"{align(finish_time, length=12, dir='r')}"
+            race_table.add_row(
+                f"{clan['name']} ({clan['clanScore']})", clan["fame"], finish_time
             )
 
-        clan = race["clan"]
-        # Show our clan
-        name = clan["name"]
-        score = str(clan["clanScore"])
-        fame = str(clan["fame"])
-        try:
-            finish_time = datetime_wrapper.get_date_str(
-                datetime_wrapper.utc_to_local(
-                    datetime_wrapper.datetime_from_str(clan["finishTime"])
-                )
-            )
-        except Exception:
-            finish_time = "未完成"
-        print(
-            f"{align(f'{name} ({score})', length=24)}"
-            f"{align(fame, length=8, dir='r')}"
-            f"{align(finish_time, length=12, dir='r')}"
-        )
-        print("-" * 56)
+        lines = [f"河流競賽 Week {week_idx}"]
+        lines += race_table.render(rule="=")
+        # Separate our clan from the others
+        lines.insert(-1, "-" * race_table.get_total_width())
         # Show contribution of each members
-        print("名單 (名譽/次數)：")
-        participants = clan["participants"]
-        participants.sort(key=lambda p: p["fame"], reverse=True)
-
-        num_columns = 2
-        for i, p in enumerate(participants):
-            p_name = p["name"]
-            p_fame = str(p["fame"])
-            p_deck_used = str(p["decksUsed"])
-            if i % num_columns == 0:
-                print("\n  " if i > 0 else "  ", end="")
-            print(
-                f"{align(p_name, length=20)} {align(f'({p_fame} / {p_deck_used})', length=16, dir='r')}  ",
-                end="",
-            )
-        print("")
+        lines += self.__get_participant_lines(race["clan"]["participants"])
+        table.write(lines)
+
+    def get_current_race(self):
+        """Get current river race of the clan.
+
+        Returns
+        -------
+        race : dictionary
+        """
+        query = f"/clans/{quote_plus(self.__clan_tag)}/currentriverrace"
+        try:
+            race = self.__send_req(query)
+        except Exception as e:
+            print("Error: Unable to retrieve current river race", e)
+            return None
+
+        return race
 
     def get_racelog(self, limit=0):
         """Get racelog of the clan.
@@ -329,8 +511,56 @@ class CRAPI(metaclass=singleton.Singleton):
 
         return racelog
 
+    def iter_racelog(self, page_size=None):
+        """Iterate over racelog of the clan, one page per request.
+
+        Pages are requested on demand with the "after" cursor, so stopping
+        early skips the older pages.
+
+        Parameters
+        ----------
+        page_size : int
+            Races per request, defaults to "racelog_page_size" of crapi.json.
+
+        Yields
+        ------
+        race : dictionary
+            Order: later to former.
+
+        Raises
+        ------
+        Exception
+            If a page cannot be retrieved.
+        """
+        page_size = page_size or self.__racelog_page_size
+        query = f"/clans/{quote_plus(self.__clan_tag)}/riverracelog"
+        query += f"?limit={page_size}"
+        after = None
+        while True:
+            resp = self.__send_req(
+                query + (f"&after={quote_plus(after)}" if after else "")
+            )
+            if not resp:
+                raise Exception("Unable to retrieve racelog")
+            metrics.incr("crapi.racelog_pages")
+            yield from resp["items"]
+
+            after = ((resp.get("paging") or {}).get("cursors") or {}).get("after")
+            if not after or not resp["items"]:
+                return
+
     def show_racelog(self, limit=0):
-        racelog = self.get_racelog(limit)
+        snapshot = self.get_fresh_snapshot()
+        if snapshot is not None:
+            racelog = snapshot.get_racelog(limit)
+        else:
+            # One page of limit races, older pages are never requested
+            races = self.iter_racelog(page_size=limit or None)
+            try:
+                racelog = list(itertools.islice(races, limit or None))
+            except Exception as e:
+                print("Error: Unable to retrieve racelog", e)
+                racelog = None
 
         if not racelog or len(racelog) == 0:
             print("沒有河流競賽紀錄")
@@ -349,8 +579,10 @@ class CRAPI(metaclass=singleton.Singleton):
             )
         )
 
-        print(f"河流競賽紀錄 {early_date_str} ~ {late_date_str}，共 {len(racelog)} 筆")
-        print("=" * 56)
+        lines = [
+            f"河流競賽紀錄 {early_date_str} ~ {late_date_str}，共 {len(racelog)} 筆",
+            "=" * 56,
+        ]
         for race in reversed(racelog):
             season_id = race["seasonId"]
             section_idx = race["sectionIndex"]
@@ -381,35 +613,22 @@ class CRAPI(metaclass=singleton.Singleton):
                     except Exception:
                         finished_date_str = "未完成"
                     participants = clan["participants"]
-                    participants.sort(key=lambda p: p["fame"], reverse=True)
                     break
 
-            print(
-                f"河流競賽 {season_id}-{week_idx}\n"
-                f"完成日期： {finished_date_str}\n"
-                f"結束日期： {created_date_str}\n"
-                f"名次： {rank}\n"
-                f"獎盃： {trophy_change}\n"
-                f"名譽： {fame}\n"
-                f"參加人數： {len(participants) if participants else 0}\n"
-                "名單 (名譽/次數)："
-            )
+            lines += [
+                f"河流競賽 {season_id}-{week_idx}",
+                f"完成日期： {finished_date_str}",
+                f"結束日期： {created_date_str}",
+                f"名次： {rank}",
+                f"獎盃： {trophy_change}",
+                f"名譽： {fame}",
+                f"參加人數： {len(participants) if participants else 0}",
+            ]
 
             if not participants:
-                return
+                break
 
-            num_columns = 2
-            for i, p in enumerate(participants):
-                p_name = p["name"]
-                p_fame = str(p["fame"])
-                # p_boat_attacks = str(p['boatAttacks'])
-                p_deck_used = str(p["decksUsed"])
-                # p_deck_used_today = str(p['decksUsedToday'])
-                if i % num_columns == 0:
-                    print("\n  " if i > 0 else "  ", end="")
-                print(
-                    f"{align(p_name, length=20)} {align(f'({p_fame} / {p_deck_used})', length=16, dir='r')}  ",
-                    end="",
-                )
-            print("")
-            print("=" * 56)
+            lines += self.__get_participant_lines(participants)
+            lines.append("=" * 56)
+
+        table.write(lines)
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+import ipaddress
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from dotenv import set_key
+
+from utils import api, metrics
+
+ENV_PATH = ".env"
+DEFAULT_IP_CHECK_INTERVAL = 300
+DEFAULT_REFRESH_COOLDOWN = 60
+# Keys allowed per developer account
+MAX_KEYS = 10
+
+
+def parse_ip(text):
+    """Get the IP address from a response body, None if it is not one.
+
+    Examples
+    --------
+    >>> parse_ip("203.0.113.7\\n")
+    '203.0.113.7'
+
+    >>> parse_ip("<html>") is None
+    True
+    """
+    try:
+        return str(ipaddress.ip_address(text.strip()))
+    except ValueError:
+        return None
+
+
+class KeyManager:
+    """Lifecycle of the API key bound to the external IP.
+
+    Keys of the Clash Royale API only work from the IP they were created
+    for. The external IP is cached and checked every ip_check_interval
+    seconds; when it changes the key is replaced before requests start to
+    fail. Refreshes are single-flight: concurrent callers rejected with the
+    same token share one refresh. New tokens are pushed to the registered
+    clients, which swap their Authorization header in place.
+
+    Parameters
+    ----------
+    dev_uri : str
+        Base URL of the developer API.
+    ip_check_interval : float
+        Seconds an external IP is trusted before checking it again.
+    refresh_cooldown : float
+        Seconds to wait after a failed refresh before trying again.
+    """
+
+    def __init__(
+        self,
+        dev_uri,
+        ip_check_interval=DEFAULT_IP_CHECK_INTERVAL,
+        refresh_cooldown=DEFAULT_REFRESH_COOLDOWN,
+    ):
+        self.__dev_uri = dev_uri
+        self.__ip_check_interval = ip_check_interval
+        self.__refresh_cooldown = refresh_cooldown
+        self.__ip = None
+        self.__ip_checked = None
+        self.__failed_at = None
+        self.__listeners = []
+        self.__ip_lock = threading.Lock()
+        self.__refresh_lock = threading.Lock()
+
+    def get_token(self):
+        return os.environ.get("CRAPI_TOKEN") or ""
+
+    def add_listener(self, set_jwt):
+        """Call set_jwt(token) whenever the token is replaced."""
+        with self.__refresh_lock:
+            self.__listeners.append(set_jwt)
+
+    def get_external_ip(self, max_age=None):
+        """Get the external IP, cached for max_age seconds.
+
+        Returns
+        -------
+        ip : str
+            None if it has never been retrieved.
+        """
+        if max_age is None:
+            max_age = self.__ip_check_interval
+        with self.__ip_lock:
+            if (
+                self.__ip_checked is not None
+                and time.monotonic() - self.__ip_checked < max_age
+            ):
+                return self.__ip
+
+            try:
+                ip = parse_ip(api.API().get_external_ip())
+            except Exception:
+                ip = None
+            # Check again later even on failure, keeping the last known IP
+            self.__ip_checked = time.monotonic()
+            if ip is None:
+                print("Warning: Unable to check external IP")
+            else:
+                self.__ip = ip
+            return self.__ip
+
+    def ensure_valid(self):
+        """Replace the key ahead of time if the external IP has changed.
+
+        Cheap when the IP was checked within ip_check_interval.
+        """
+        key_ip = os.environ.get("CRAPI_TOKEN_IP")
+        if not key_ip:
+            # Unknown origin of the key, rely on rejections
+            return
+        ip = self.get_external_ip()
+        if ip is not None and ip != key_ip:
+            print(f"External IP changed ({key_ip} -> {ip}), refreshing API key")
+            self.refresh(rejected_token=self.get_token())
+
+    def refresh(self, rejected_token=None):
+        """Create a key for the current external IP.
+
+        Parameters
+        ----------
+        rejected_token : str
+            Token which was rejected. If the current token differs, another
+            caller has already refreshed it.
+
+        Returns
+        -------
+        refreshed : bool
+            Whether a valid new token is available.
+        """
+        with self.__refresh_lock:
+            if rejected_token is not None and self.get_token() != rejected_token:
+                return True
+            if (
+                self.__failed_at is not None
+                and time.monotonic() - self.__failed_at < self.__refresh_cooldown
+            ):
+                return False
+
+            metrics.incr("crapi.token_refresh")
+            token, ip = self.__create_key()
+            if token is None:
+                self.__failed_at = time.monotonic()
+                return False
+            self.__failed_at = None
+
+            set_key(ENV_PATH, key_to_set="CRAPI_TOKEN", value_to_set=token)
+            set_key(ENV_PATH, key_to_set="CRAPI_TOKEN_IP", value_to_set=ip)
+            os.environ["CRAPI_TOKEN"] = token
+            os.environ["CRAPI_TOKEN_IP"] = ip
+            # Swap the token in place, requests in flight keep the same client
+            for set_jwt in self.__listeners:
+                set_jwt(token)
+            return True
+
+    def __create_key(self):
+        """Log in and get a key for the current IP.
+
+        Returns
+        -------
+        token : str
+            None if failed.
+        ip : str
+        """
+        dev_api = api.API()
+        dev_api.set_url(self.__dev_uri)
+        email = os.environ.get("CRAPI_EMAIL")
+        password = os.environ.get("CRAPI_PASSWORD")
+
+        try:
+            ip = self.get_external_ip(max_age=0)
+            if ip is None:
+                return None, None
+
+            dev_api.POST("/login", json.dumps({"email": email, "password": password}))
+            keys = dev_api.POST("/apikey/list")["keys"] or []
+
+            # Reuse a key already bound to this IP
+            for key in keys:
+                if (key.get("cidrRanges") or []) == [ip] and key.get("key"):
+                    return key["key"], ip
+
+            if len(keys) >= MAX_KEYS:
+                # Prefer revoking a key bound to another IP
+                stale = [
+                    key for key in keys if ip not in (key.get("cidrRanges") or [])
+                ]
+                revoked = (stale or keys)[-1]
+                dev_api.POST("/apikey/revoke", json.dumps({"id": revoked["id"]}))
+
+            date = datetime.today().strftime("%Y%m%d")
+            resp = dev_api.POST(
+                "/apikey/create",
+                json.dumps(
+                    {
+                        "name": f"CR Manager {date}",
+                        "description": "For single IP address",
+                        "cidrRanges": [ip],
+                        "scopes": None,
+                    }
+                ),
+            )
+            return resp["key"]["key"], ip
+
+        except Exception as e:
+            if len(e.args) != 2:
+                print("Refresh request error:", e)
+                return None, None
+            status, payload = e.args
+            if not isinstance(payload, dict):
+                payload = payload.text
+            print(
+                "Refresh request error:\n"
+                f"  Status: {status}\n"
+                f"  Response: {payload}\n"
+            )
+            return None, None
+
+
+# Shared by every client of the process, created on first use
+_key_manager = None
+_key_manager_lock = threading.Lock()
+
+
+def get_key_manager(api_config):
+    """Get the key manager of the process.
+
+    Parameters
+    ----------
+    api_config : dictionary
+        Content of crapi.json.
+    """
+    global _key_manager
+    with _key_manager_lock:
+        if _key_manager is None:
+            keys_config = api_config.get("keys") or {}
+            _key_manager = KeyManager(
+                api_config["dev_uri"] or "",
+                ip_check_interval=keys_config.get(
+                    "ip_check_interval", DEFAULT_IP_CHECK_INTERVAL
+                ),
+                refresh_cooldown=keys_config.get(
+                    "refresh_cooldown", DEFAULT_REFRESH_COOLDOWN
+                ),
+            )
+    return _key_manager
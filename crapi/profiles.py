@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import atexit
+import json
+import threading
+import time
+
+from utils import cache
+
+DEFAULT_MAX_AGE = 86400
+
+
+class ProfileCache:
+    """Persisted best trophies of players.
+
+    Best trophies only change when a player reaches a new high, which needs
+    current trophies at or above the recorded best. So a profile is fetched
+    again only for new players, players at or above their cached best, or
+    entries older than max_age.
+
+    Parameters
+    ----------
+    path : str
+        File to persist entries across processes, None to keep in memory.
+    max_age : float
+        Seconds before an entry is fetched again regardless of trophies.
+    """
+
+    def __init__(self, path=None, max_age=DEFAULT_MAX_AGE):
+        self.__path = path
+        self.__max_age = max_age
+        # tag -> {"bestTrophies": int, "fetched": epoch seconds}
+        self.__entries = {}
+        self.__lock = threading.Lock()
+        self.__dirty = False
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def get_best_trophies(self, tag):
+        """Get cached best trophies of the player, None if not cached."""
+        with self.__lock:
+            entry = self.__entries.get(tag)
+            return entry["bestTrophies"] if entry else None
+
+    def get_stale_tags(self, members):
+        """Get tags of members whose profile should be fetched.
+
+        Parameters
+        ----------
+        members : list
+            Members from the members endpoint, with current "trophies".
+
+        Returns
+        -------
+        tags : list
+            In the order of members.
+        """
+        now = time.time()
+        tags = []
+        with self.__lock:
+            for member in members:
+                entry = self.__entries.get(member["tag"])
+                if (
+                    entry is None
+                    or member["trophies"] >= entry["bestTrophies"]
+                    or now - entry["fetched"] > self.__max_age
+                ):
+                    tags.append(member["tag"])
+        return tags
+
+    def put(self, player):
+        """Cache best trophies of a fetched player profile."""
+        with self.__lock:
+            self.__entries[player["tag"]] = {
+                "bestTrophies": player["bestTrophies"],
+                "fetched": time.time(),
+            }
+            self.__dirty = True
+
+    def load(self):
+        """Load entries from the file, ignoring a missing or broken file."""
+        try:
+            with open(self.__path, encoding="utf-8") as cache_file:
+                entries = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+
+        with self.__lock:
+            self.__entries = entries
+
+    def save(self):
+        """Write entries to the file if anything changed."""
+        if not self.__path or not self.__dirty:
+            return
+
+        with self.__lock:
+            entries = dict(self.__entries)
+            self.__dirty = False
+
+        try:
+            cache.write_json_atomic(self.__path, entries)
+        except OSError as err:
+            print(f"Cache saving error: {err}")
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from utils import datetime_wrapper
+
+
+class ClanSnapshot:
+    """Data of a clan fetched at once: members with player profiles,
+    current river race and racelog.
+
+    Commands of a session share one snapshot while it is fresh, so they
+    work on consistent data without fetching it again. Fields are shared,
+    do not modify them.
+
+    Parameters
+    ----------
+    members : dictionary
+        Use tag as key, member as value (as CRAPI.get_members_dic).
+    race : dictionary
+        Current river race.
+    racelog : list
+        Order: later to former.
+    """
+
+    def __init__(self, members, race, racelog):
+        self.members = members
+        self.race = race
+        self.racelog = racelog
+        self.fetched_at = datetime_wrapper.get_utcnow()
+        self.__fetched = time.monotonic()
+
+    def get_age(self):
+        """Get seconds since the snapshot was fetched."""
+        return time.monotonic() - self.__fetched
+
+    def is_fresh(self, max_age):
+        return self.get_age() <= max_age
+
+    def is_complete(self):
+        """Check if every part was retrieved."""
+        return (
+            self.members is not None
+            and self.race is not None
+            and self.racelog is not None
+        )
+
+    def get_member_list(self):
+        """Get members ordered by clan rank, None if unavailable."""
+        if self.members is None:
+            return None
+        return sorted(self.members.values(), key=lambda m: m["clanRank"])
+
+    def get_racelog(self, limit=0):
+        """Get the latest races, all if limit is 0."""
+        if self.racelog is None or limit <= 0:
+            return self.racelog
+        return self.racelog[:limit]
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import importlib.resources
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from crapi import crapi
+from history import history
+from spreadsheet import spreadsheet
+from utils import metrics
+
+# Jobs of each clan, name -> method of Sheet
+SHEET_JOBS = {
+    "members": "update_members",
+    "trophy": "update_trophies",
+    "racelog": "update_racelog",
+    "donation": "update_donations",
+}
+
+
+class ClanFamily:
+    """Manager of a family of clans listed in config/clans.json.
+
+    Each clan maps to a spreadsheet and worksheet. Jobs of all clans run on
+    one worker pool, while API rate limits and the response cache are shared
+    process-wide by the clients.
+    """
+
+    def __init__(self):
+        with importlib.resources.open_text("config", "clans.json") as clans_file:
+            clans_config = json.load(clans_file)
+            clans_file.close()
+        self.__clans = clans_config.get("clans") or []
+        self.__max_workers = clans_config.get("max_workers") or len(self.__clans)
+        self.__sheets = {}
+        self.__histories = {}
+        self.__lock = threading.Lock()
+
+    def get_clan_tags(self):
+        return [clan["tag"] for clan in self.__clans]
+
+    def get_sheet(self, clan):
+        """Get the Sheet of a clan, opened on first use."""
+        tag = clan["tag"]
+        with self.__lock:
+            sheet = self.__sheets.get(tag)
+        if sheet is None:
+            # Opened outside the lock so clans authorize in parallel
+            sheet = spreadsheet.Sheet(
+                index=clan.get("worksheet", 0),
+                clan_tag=tag,
+                title=clan.get("spreadsheet") or spreadsheet.SPREADSHEET_TITLE,
+            )
+            with self.__lock:
+                sheet = self.__sheets.setdefault(tag, sheet)
+        return sheet
+
+    def get_history(self, clan):
+        """Get the local history of a clan, opened on first use."""
+        tag = clan["tag"]
+        with self.__lock:
+            clan_history = self.__histories.get(tag)
+            if clan_history is None:
+                clan_history = history.History(tag)
+                self.__histories[tag] = clan_history
+        return clan_history
+
+    def close(self):
+        """Close the local histories opened."""
+        with self.__lock:
+            histories = list(self.__histories.values())
+            self.__histories = {}
+        for clan_history in histories:
+            clan_history.close()
+
+    def __run_clan(self, clan, job, kwargs):
+        if job == "history":
+            self.get_history(clan).sync(crapi.CRAPI(clan["tag"]))
+        else:
+            getattr(self.get_sheet(clan), SHEET_JOBS[job])(**kwargs)
+
+    def run(self, job, **kwargs):
+        """Run a job for all clans concurrently.
+
+        Parameters
+        ----------
+        job : str
+            "history" or a key of SHEET_JOBS.
+        kwargs : dictionary
+            Arguments of the Sheet method.
+
+        Returns
+        -------
+        failed_tags : list
+            Tags of the clans whose job failed.
+        """
+        if job != "history" and job not in SHEET_JOBS:
+            raise ValueError(f"Unknown job: {job}")
+        if not self.__clans:
+            print("沒有設定部落，請編輯 config/clans.json")
+            return []
+
+        failed_tags = []
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            futures = {
+                # Bound so requests of the clan count for the running operation
+                executor.submit(
+                    metrics.bind(self.__run_clan), clan, job, kwargs
+                ): clan["tag"]
+                for clan in self.__clans
+            }
+            for future in as_completed(futures):
+                tag = futures[future]
+                try:
+                    future.result()
+                    print(f"Clan {tag}: {job} done")
+                except BaseException as e:
+                    print(f"Error: Clan {tag}: {job} failed", e)
+                    failed_tags.append(tag)
+
+        return failed_tags
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import gzip
+import os
+import tempfile
+from datetime import datetime
+
+from utils import datetime_wrapper
+
+EXPORT_DIR = "data/export"
+CHUNK_SIZE = 10000
+FORMATS = ("csv", "parquet", "arrow")
+# File extension of each format
+EXTENSIONS = {"csv": ".csv.gz", "parquet": ".parquet", "arrow": ".arrow"}
+
+# Columns of exported tables, (name, type); race JSON is left out
+SCHEMAS = {
+    "members": (
+        ("clan_tag", "string"),
+        ("tag", "string"),
+        ("snapshot_time", "timestamp"),
+        ("name", "string"),
+        ("role", "string"),
+        ("exp_level", "int"),
+        ("trophies", "int"),
+        ("best_trophies", "int"),
+        ("donations", "int"),
+        ("donations_received", "int"),
+    ),
+    "races": (
+        ("clan_tag", "string"),
+        ("created_date", "timestamp"),
+        ("season_id", "int"),
+        ("section_index", "int"),
+        ("rank", "int"),
+        ("trophy_change", "int"),
+        ("fame", "int"),
+        ("finish_time", "timestamp"),
+    ),
+    "race_participants": (
+        ("clan_tag", "string"),
+        ("created_date", "timestamp"),
+        ("tag", "string"),
+        ("name", "string"),
+        ("fame", "int"),
+        ("repair_points", "int"),
+        ("boat_attacks", "int"),
+        ("decks_used", "int"),
+    ),
+    "donations": (
+        ("clan_tag", "string"),
+        ("date", "date"),
+        ("tag", "string"),
+        ("donations", "int"),
+        ("donations_received", "int"),
+    ),
+}
+
+
+def convert(value, type_name):
+    """Convert a stored value to the python value of the column type.
+
+    Examples
+    --------
+    >>> convert("20240101T093000.000Z", "timestamp")
+    datetime.datetime(2024, 1, 1, 9, 30, tzinfo=datetime.timezone.utc)
+
+    >>> convert("20240101", "date")
+    datetime.date(2024, 1, 1)
+
+    >>> convert(None, "int") is None
+    True
+    """
+    if value is None:
+        return None
+    if type_name == "timestamp":
+        return datetime_wrapper.datetime_from_str(value)
+    if type_name == "date":
+        return datetime.strptime(value, "%Y%m%d").date()
+    if type_name == "int":
+        return int(value)
+    return str(value)
+
+
+def get_arrow_schema(schema):
+    import pyarrow as pa
+
+    types = {
+        "string": pa.string(),
+        "int": pa.int64(),
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+        "date": pa.date32(),
+    }
+    return pa.schema([(name, types[type_name]) for name, type_name in schema])
+
+
+class _CSVWriter:
+    """Gzip compressed CSV with a header row, timestamps in ISO 8601."""
+
+    def __init__(self, path, schema):
+        self.__schema = schema
+        self.__file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self.__writer = csv.writer(self.__file)
+        self.__writer.writerow([name for name, _ in schema])
+
+    def write(self, columns):
+        columns = [
+            [None if v is None else v.isoformat() for v in column]
+            if type_name in ("timestamp", "date")
+            else column
+            for column, (_, type_name) in zip(columns, self.__schema)
+        ]
+        # None is written as an empty field
+        self.__writer.writerows(zip(*columns))
+
+    def close(self):
+        self.__file.close()
+
+
+class _ArrowWriter:
+    """Parquet or Arrow IPC file, one record batch per chunk, zstd compressed."""
+
+    def __init__(self, path, schema, fmt):
+        import pyarrow as pa
+
+        self.__schema = get_arrow_schema(schema)
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self.__writer = pq.ParquetWriter(path, self.__schema, compression="zstd")
+        else:
+            self.__writer = pa.ipc.new_file(
+                path,
+                self.__schema,
+                options=pa.ipc.IpcWriteOptions(compression="zstd"),
+            )
+
+    def write(self, columns):
+        import pyarrow as pa
+
+        arrays = [
+            pa.array(column, type=field.type)
+            for column, field in zip(columns, self.__schema)
+        ]
+        batch = pa.record_batch(arrays, schema=self.__schema)
+        self.__writer.write_batch(batch)
+
+    def close(self):
+        self.__writer.close()
+
+
+def export_table(history, table, path, fmt="csv", chunk_size=CHUNK_SIZE):
+    """Write rows of the clan in a table to a file, a chunk at a time.
+
+    The file is written next to the path first and replaces it when done,
+    so a failed export never leaves half a file.
+
+    Returns
+    -------
+    num_rows : int
+    """
+    schema = SCHEMAS[table]
+    names = [name for name, _ in schema]
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    os.close(fd)
+
+    num_rows = 0
+    try:
+        if fmt == "csv":
+            writer = _CSVWriter(tmp_path, schema)
+        else:
+            writer = _ArrowWriter(tmp_path, schema, fmt)
+        try:
+            for rows in history.iter_rows(table, names, chunk_size):
+                # Columnar: one list of converted values per column
+                columns = [
+                    [convert(value, type_name) for value in column]
+                    for column, (_, type_name) in zip(zip(*rows), schema)
+                ]
+                writer.write(columns)
+                num_rows += len(rows)
+        finally:
+            writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return num_rows
+
+
+def export_history(history, fmt="csv", directory=EXPORT_DIR, chunk_size=CHUNK_SIZE):
+    """Export members, races, race participants and donations of the clan.
+
+    Files are named "<clan tag>_<table><extension>" in the directory, e.g.
+    "ABC123_races.parquet".
+
+    Parameters
+    ----------
+    history : history.History
+        Local history of the clan.
+    fmt : str
+        One of FORMATS, parquet and arrow need pyarrow.
+    directory : str
+        Directory of the files.
+    chunk_size : int
+        Rows read and written at a time.
+
+    Returns
+    -------
+    paths : list
+        Files written, empty if failed.
+    """
+    if fmt not in FORMATS:
+        print(f"Error: Unknown format {fmt}, use one of {', '.join(FORMATS)}")
+        return []
+    if fmt != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print(f"Error: {fmt} export needs pyarrow, run `pip install pyarrow`")
+            return []
+
+    prefix = history.get_clan_tag().lstrip("#")
+    paths = []
+    for table in SCHEMAS:
+        path = os.path.join(directory, f"{prefix}_{table}{EXTENSIONS[fmt]}")
+        try:
+            num_rows = export_table(history, table, path, fmt, chunk_size)
+        except (OSError, ValueError) as e:
+            print(f"Error: Failed to export {table}", e)
+            continue
+        print(f"Exported {table}: {num_rows} rows -> {path}")
+        paths.append(path)
+    return paths
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sqlite3
+import threading
+
+from utils import datetime_wrapper
+
+HISTORY_PATH = "data/history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    clan_tag TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    snapshot_time TEXT NOT NULL,
+    name TEXT,
+    role TEXT,
+    exp_level INTEGER,
+    trophies INTEGER,
+    best_trophies INTEGER,
+    donations INTEGER,
+    donations_received INTEGER,
+    PRIMARY KEY (clan_tag, tag, snapshot_time)
+);
+CREATE TABLE IF NOT EXISTS races (
+    clan_tag TEXT NOT NULL,
+    created_date TEXT NOT NULL,
+    season_id INTEGER,
+    section_index INTEGER,
+    rank INTEGER,
+    trophy_change INTEGER,
+    fame INTEGER,
+    finish_time TEXT,
+    race_json TEXT NOT NULL,
+    PRIMARY KEY (clan_tag, created_date)
+);
+CREATE TABLE IF NOT EXISTS race_participants (
+    clan_tag TEXT NOT NULL,
+    created_date TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    name TEXT,
+    fame INTEGER,
+    repair_points INTEGER,
+    boat_attacks INTEGER,
+    decks_used INTEGER,
+    PRIMARY KEY (clan_tag, created_date, tag)
+);
+CREATE TABLE IF NOT EXISTS donations (
+    clan_tag TEXT NOT NULL,
+    date TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    donations INTEGER,
+    donations_received INTEGER,
+    PRIMARY KEY (clan_tag, date, tag)
+);
+"""
+
+TABLES = ("members", "races", "race_participants", "donations")
+
+# Member fields tracked by snapshots, (column, key in API member)
+MEMBER_FIELDS = (
+    ("name", "name"),
+    ("role", "role"),
+    ("exp_level", "expLevel"),
+    ("trophies", "trophies"),
+    ("best_trophies", "bestTrophies"),
+    ("donations", "donations"),
+    ("donations_received", "donationsReceived"),
+)
+
+
+class History:
+    """Local history of a clan in SQLite.
+
+    Keeps member snapshots, river race results and donation snapshots, so
+    the sheet and historical queries can be served without remote reads.
+
+    Parameters
+    ----------
+    clan_tag : str
+        Tag of the clan.
+    path : str
+        Database file, created if missing.
+    """
+
+    def __init__(self, clan_tag, path=None):
+        path = path or os.environ.get("CR_HISTORY_PATH") or HISTORY_PATH
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__clan_tag = clan_tag
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(path, check_same_thread=False)
+        self.__conn.row_factory = sqlite3.Row
+        with self.__conn:
+            self.__conn.executescript(SCHEMA)
+
+    def close(self):
+        self.__conn.close()
+
+    def get_clan_tag(self):
+        return self.__clan_tag
+
+    def __query(self, sql, params=()):
+        with self.__lock:
+            return self.__conn.execute(sql, params).fetchall()
+
+    def get_latest_members(self):
+        """Get the latest snapshot of each member.
+
+        Returns
+        -------
+        members : dictionary
+            Use tag as key, row (sqlite3.Row) as value.
+        """
+        rows = self.__query(
+            "SELECT m.* FROM members m JOIN ("
+            "  SELECT tag, MAX(snapshot_time) AS snapshot_time FROM members"
+            "  WHERE clan_tag = ? GROUP BY tag"
+            ") latest USING (tag, snapshot_time) WHERE m.clan_tag = ?",
+            (self.__clan_tag, self.__clan_tag),
+        )
+        return {row["tag"]: row for row in rows}
+
+    def sync_members(self, members):
+        """Store snapshots of members whose fields changed.
+
+        Parameters
+        ----------
+        members : dictionary
+            Use tag as key, member as value (as CRAPI.get_members_dic).
+
+        Returns
+        -------
+        num_changed : int
+            Number of members stored.
+        """
+        latest = self.get_latest_members()
+        snapshot_time = datetime_wrapper.get_utcnow_str()
+
+        rows = []
+        for tag, member in members.items():
+            fields = {column: member.get(key) for column, key in MEMBER_FIELDS}
+            last = latest.get(tag)
+            if last is not None:
+                # Keep the stored best trophies if the profile is unavailable
+                if fields["best_trophies"] is None:
+                    fields["best_trophies"] = last["best_trophies"]
+                if all(fields[column] == last[column] for column in fields):
+                    continue
+            rows.append((self.__clan_tag, tag, snapshot_time) + tuple(fields.values()))
+
+        columns = ", ".join(column for column, _ in MEMBER_FIELDS)
+        with self.__lock, self.__conn:
+            self.__conn.executemany(
+                f"INSERT INTO members (clan_tag, tag, snapshot_time, {columns}) "
+                f"VALUES (?, ?, ?{', ?' * len(MEMBER_FIELDS)})",
+                rows,
+            )
+
+        return len(rows)
+
+    def get_latest_race_date(self):
+        """Get createdDate of the latest stored race, None if there is none."""
+        rows = self.__query(
+            "SELECT MAX(created_date) FROM races WHERE clan_tag = ?",
+            (self.__clan_tag,),
+        )
+        return rows[0][0]
+
+    def sync_racelog(self, racelog):
+        """Store races newer than the latest stored race.
+
+        Parameters
+        ----------
+        racelog : list
+            Races from CRAPI.get_racelog, order: later to former.
+
+        Returns
+        -------
+        num_new : int
+            Number of races stored.
+        """
+        race_rows = []
+        participant_rows = []
+        for race in racelog:
+            created_date = race["createdDate"]
+            rank = trophy_change = fame = finish_time = None
+            for standing in race["standings"]:
+                clan = standing["clan"]
+                if clan["tag"] != self.__clan_tag:
+                    continue
+                rank = standing["rank"]
+                trophy_change = standing["trophyChange"]
+                fame = clan["fame"]
+                finish_time = clan.get("finishTime")
+                for p in clan["participants"]:
+                    participant_rows.append(
+                        (
+                            self.__clan_tag,
+                            created_date,
+                            p["tag"],
+                            p["name"],
+                            p["fame"],
+                            p.get("repairPoints"),
+                            p.get("boatAttacks"),
+                            p["decksUsed"],
+                        )
+                    )
+                break
+            race_rows.append(
+                (
+                    self.__clan_tag,
+                    created_date,
+                    race["seasonId"],
+                    race["sectionIndex"],
+                    rank,
+                    trophy_change,
+                    fame,
+                    finish_time,
+                    json.dumps(race, ensure_ascii=False),
+                )
+            )
+
+        # The latest date is read and the races are stored under one lock,
+        # races stored by another process meanwhile are ignored
+        with self.__lock, self.__conn:
+            latest_date = self.__conn.execute(
+                "SELECT MAX(created_date) FROM races WHERE clan_tag = ?",
+                (self.__clan_tag,),
+            ).fetchone()[0]
+            latest_date = latest_date or ""
+            cursor = self.__conn.executemany(
+                "INSERT OR IGNORE INTO races VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in race_rows if row[1] > latest_date],
+            )
+            num_new = cursor.rowcount
+            self.__conn.executemany(
+                "INSERT OR IGNORE INTO race_participants"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in participant_rows if row[1] > latest_date],
+            )
+
+        return num_new
+
+    def get_racelog(self, after=None, limit=0):
+        """Get stored races in the shape of CRAPI.get_racelog.
+
+        Parameters
+        ----------
+        after : str
+            Only races created after this createdDate.
+        limit : int
+            Maximum number of latest races, 0 for all.
+
+        Returns
+        -------
+        racelog : list
+            Order: later to former.
+        """
+        sql = "SELECT race_json FROM races WHERE clan_tag = ? AND created_date > ?"
+        sql += " ORDER BY created_date DESC"
+        params = [self.__clan_tag, after or ""]
+        if limit > 0:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [json.loads(row[0]) for row in self.__query(sql, params)]
+
+    def get_race_participants(self, limit=0):
+        """Get participants of stored races.
+
+        Parameters
+        ----------
+        limit : int
+            Only participants of the latest races, 0 for all.
+
+        Returns
+        -------
+        rows : list
+            (created_date, tag, name, fame, decks_used), order: former to
+            later.
+        """
+        sql = (
+            "SELECT created_date, tag, name, fame, decks_used"
+            " FROM race_participants WHERE clan_tag = ?"
+        )
+        params = [self.__clan_tag]
+        if limit > 0:
+            sql += (
+                " AND created_date IN ("
+                "  SELECT created_date FROM races WHERE clan_tag = ?"
+                "  ORDER BY created_date DESC LIMIT ?"
+                ")"
+            )
+            params += [self.__clan_tag, limit]
+        sql += " ORDER BY created_date"
+        return [tuple(row) for row in self.__query(sql, params)]
+
+    def iter_rows(self, table, columns, chunk_size=1000):
+        """Iterate over rows of the clan in a table, a chunk at a time.
+
+        Parameters
+        ----------
+        table : str
+            One of TABLES.
+        columns : list
+            Names of the columns.
+        chunk_size : int
+            Maximum number of rows of a chunk.
+
+        Yields
+        ------
+        rows : list
+            Tuples of the column values, in order of insertion.
+        """
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        if not all(column.isidentifier() for column in columns):
+            raise ValueError(f"Invalid columns: {columns}")
+
+        sql = f"SELECT {', '.join(columns)} FROM {table} WHERE clan_tag = ?"
+        with self.__lock:
+            cursor = self.__conn.execute(sql + " ORDER BY rowid", (self.__clan_tag,))
+        while True:
+            with self.__lock:
+                rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield [tuple(row) for row in rows]
+
+    def sync_donations(self, members, date):
+        """Store donations of members on the date, replacing the same date.
+
+        Parameters
+        ----------
+        members : dictionary
+            Use tag as key, member as value.
+        date : str
+            Date in YYYYMMDD.
+        """
+        rows = [
+            (
+                self.__clan_tag,
+                date,
+                tag,
+                member["donations"],
+                member.get("donationsReceived"),
+            )
+            for tag, member in members.items()
+        ]
+        with self.__lock, self.__conn:
+            self.__conn.executemany(
+                "INSERT OR REPLACE INTO donations VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def sync(self, crapi):
+        """Store what is new in members and racelog of the clan snapshot.
+
+        Parameters
+        ----------
+        crapi : crapi.CRAPI
+            Client of the clan.
+        """
+        snapshot = crapi.get_snapshot()
+        members = snapshot.members
+        racelog = snapshot.racelog
+
+        if members:
+            num_changed = self.sync_members(members)
+            print(f"Members: {num_changed} changed")
+        else:
+            print("Error: Failed to retrieve members. 'members' is None.")
+
+        if racelog:
+            num_new = self.sync_racelog(racelog)
+            print(f"Racelog: {num_new} new races")
+        else:
+            print("Error: Failed to retrieve racelog. 'racelog' is None.")
+
+    def get_member_history(self, tag):
+        """Get all snapshots of a member, order: former to later."""
+        return self.__query(
+            "SELECT * FROM members WHERE clan_tag = ? AND tag = ?"
+            " ORDER BY snapshot_time",
+            (self.__clan_tag, tag),
+        )
+
+    def get_participations(self, tag):
+        """Get river race records of a member, order: later to former."""
+        return self.__query(
+            "SELECT p.*, r.season_id, r.section_index FROM race_participants p"
+            " JOIN races r USING (clan_tag, created_date)"
+            " WHERE p.clan_tag = ? AND p.tag = ? ORDER BY p.created_date DESC",
+            (self.__clan_tag, tag),
+        )
+
+    def get_donations(self, date):
+        """Get donations of members on the date.
+
+        Returns
+        -------
+        donations : dictionary
+            Use tag as key, donations as value.
+        """
+        rows = self.__query(
+            "SELECT tag, donations FROM donations WHERE clan_tag = ? AND date = ?",
+            (self.__clan_tag, date),
+        )
+        return {row["tag"]: row["donations"] for row in rows}
@@ -1,9 +1,54 @@
 # -*- coding: utf-8 -*-
 
+import sys
 from enum import IntEnum, auto
 
 from crapi import crapi
+from family import family
+from history import export, history
+from scheduler import scheduler
 from spreadsheet import spreadsheet
+from utils import metrics
+
+
+# Clients created on first use, so commands only pay for what they need
+# (e.g. "show race" never authorizes with Google)
+_sheet = None
+_crapi = None
+_history = None
+_family = None
+
+
+def get_sheet():
+    """Get the Google Sheet, opened on first use."""
+    global _sheet
+    if _sheet is None:
+        _sheet = spreadsheet.Sheet()
+    return _sheet
+
+
+def get_crapi():
+    """Get the CR API client, set up on first use."""
+    global _crapi
+    if _crapi is None:
+        _crapi = crapi.CRAPI()
+    return _crapi
+
+
+def get_history():
+    """Get the local history, opened on first use."""
+    global _history
+    if _history is None:
+        _history = history.History(get_crapi().get_clan_tag())
+    return _history
+
+
+def get_family():
+    """Get the clans listed in config/clans.json, read on first use."""
+    global _family
+    if _family is None:
+        _family = family.ClanFamily()
+    return _family
 
 
 # Status code of command_handler
@@ -19,6 +64,9 @@ cmd_help = (
     "    init          Initialize (setup) the sheet\n"
     "    update        Update content of sheet\n"
     "    show          Show information of clan\n"
+    "    family        Update all clans in config/clans.json\n"
+    "    export        Export local history to files\n"
+    "    stats         Show metrics of commands\n"
     "    quit          Quit\n"
 )
 
@@ -30,7 +78,7 @@ def command_handler(cmd):
 
     tok = cmd.pop(0)
     if tok == "init":
-        sheet.init()
+        get_sheet().init()
         return Status.OK
     elif tok == "update":
         update_handler(cmd)
@@ -38,6 +86,15 @@ def command_handler(cmd):
     elif tok == "show":
         show_handler(cmd)
         return Status.OK
+    elif tok == "family":
+        family_handler(cmd)
+        return Status.OK
+    elif tok == "export":
+        export_handler(cmd)
+        return Status.OK
+    elif tok == "stats":
+        stats_handler(cmd)
+        return Status.OK
     elif tok == "quit":
         return Status.QUIT
     elif tok == "test":
@@ -53,6 +110,7 @@ show_cmd_help = (
     "    members               Show all clan members\n"
     "    race                  Show current river race\n"
     "    racelog [count]       Show racelog (specified number)\n"
+    "    stats [count]         Show race stats of members (latest races)\n"
 )
 
 
@@ -63,10 +121,10 @@ def show_handler(cmd):
 
     tok = cmd.pop(0)
     if tok == "members":
-        crapi.show_members()
+        get_crapi().show_members()
         return Status.OK
     elif tok == "race":
-        crapi.show_race()
+        get_crapi().show_race()
         return Status.OK
     elif tok == "racelog":
         if len(cmd) > 0:
@@ -75,16 +133,41 @@ def show_handler(cmd):
             except Exception:
                 print(show_cmd_help)
                 return Status.FAIL
-            crapi.show_racelog(count)
+            get_crapi().show_racelog(count)
             return Status.OK
         else:
-            crapi.show_racelog()
+            get_crapi().show_racelog()
             return Status.OK
+    elif tok == "stats":
+        count = 0
+        if len(cmd) > 0:
+            try:
+                count = int(cmd.pop(0))
+            except Exception:
+                print(show_cmd_help)
+                return Status.FAIL
+        show_stats(count)
+        return Status.OK
     else:
         print(show_cmd_help)
         return Status.FAIL
 
 
+def show_stats(count=0):
+    # Imported on first use, numpy is only needed by analytics
+    from analytics import analytics
+
+    matrix = analytics.RaceMatrix.from_history(get_history(), limit=count)
+    # Only tags of current members are needed, no player profiles
+    snapshot = get_crapi().get_fresh_snapshot()
+    if snapshot is not None:
+        members = snapshot.get_member_list()
+    else:
+        members = get_crapi().get_members()
+    tags = [member["tag"] for member in members] if members else None
+    analytics.show_stats(matrix, tags=tags)
+
+
 # Help message of command "update"
 update_cmd_help = (
     "Update (update)\n"
@@ -92,6 +175,8 @@ update_cmd_help = (
     "    trophy                Update trophies of members\n"
     "    racelog               Update racelog\n"
     "    donation [date]       Update donations of members (specified date)\n"
+    "    history               Update local history of members and racelog\n"
+    "    all                   Update all of the above from one fetch\n"
 )
 
 
@@ -102,37 +187,130 @@ def update_handler(cmd):
 
     tok = cmd.pop(0)
     if tok == "members":
-        sheet.update_members()
+        get_sheet().update_members()
         return Status.OK
     elif tok == "trophy":
-        sheet.update_trophies()
+        get_sheet().update_trophies()
         return Status.OK
     elif tok == "racelog":
-        sheet.update_racelog()
+        get_sheet().update_racelog()
         return Status.OK
     elif tok == "donation":
         if len(cmd) > 0:
             date = cmd.pop(0)
-            sheet.update_donations(date=date)
+            get_sheet().update_donations(date=date)
             return Status.OK
         else:
-            sheet.update_donations()
+            get_sheet().update_donations()
             return Status.OK
+    elif tok == "history":
+        get_history().sync(get_crapi())
+        return Status.OK
+    elif tok == "all":
+        get_sheet().update_all()
+        return Status.OK
     else:
         print(update_cmd_help)
         return Status.FAIL
 
 
+# Help message of command "family"
+family_cmd_help = (
+    "Family (family)\n"
+    "    members               Update members of all clans\n"
+    "    trophy                Update trophies of all clans\n"
+    "    racelog               Update racelog of all clans\n"
+    "    donation [date]       Update donations of all clans (specified date)\n"
+    "    history               Update local history of all clans\n"
+)
+
+
+def family_handler(cmd):
+    if len(cmd) == 0:
+        print(family_cmd_help)
+        return Status.FAIL
+
+    tok = cmd.pop(0)
+    if tok in ("members", "trophy", "racelog", "history"):
+        get_family().run(tok)
+        return Status.OK
+    elif tok == "donation":
+        if len(cmd) > 0:
+            get_family().run(tok, date=cmd.pop(0))
+        else:
+            get_family().run(tok)
+        return Status.OK
+    else:
+        print(family_cmd_help)
+        return Status.FAIL
+
+
+# Help message of command "export"
+export_cmd_help = (
+    "Export (export)\n"
+    "    (none)                Export to gzip CSV in data/export\n"
+    "    csv|parquet|arrow     Export to the format (parquet, arrow need pyarrow)\n"
+)
+
+
+def export_handler(cmd):
+    fmt = cmd.pop(0) if len(cmd) > 0 else "csv"
+    if fmt not in export.FORMATS:
+        print(export_cmd_help)
+        return Status.FAIL
+
+    export.export_history(get_history(), fmt=fmt)
+    return Status.OK
+
+
+# Help message of command "stats"
+stats_cmd_help = (
+    "Stats (stats)\n"
+    "    (none)                Show latest commands, latencies and counters\n"
+    "    reset                 Clear all metrics\n"
+)
+
+
+def stats_handler(cmd):
+    if len(cmd) == 0:
+        metrics.show()
+        return Status.OK
+
+    tok = cmd.pop(0)
+    if tok == "reset":
+        metrics.reset()
+        return Status.OK
+    else:
+        print(stats_cmd_help)
+        return Status.FAIL
+
+
+# Commands not measured as operations
+UNMEASURED_CMDS = ("stats", "quit")
+
+
 if __name__ == "__main__":
-    # Open Google Sheet
-    sheet = spreadsheet.Sheet()
-    # Setup CR API
-    crapi = crapi.CRAPI()
+    if "--daemon" in sys.argv[1:]:
+        # Run jobs in config/schedule.json without prompt
+        print("CR Clan Statictics Managing System (daemon)")
+        try:
+            # The daemon opens the sheet once a job needs it
+            scheduler.Daemon(client=get_crapi()).run()
+        except KeyboardInterrupt:
+            print("Daemon stopped")
+        sys.exit(0)
 
     print("CR Clan Statictics Managing System")
     while True:
         print("❯ ", end="")
         cmd = input().split()
-        ret = command_handler(cmd)
+        if cmd and cmd[0] not in UNMEASURED_CMDS:
+            with metrics.operation(" ".join(cmd)):
+                ret = command_handler(cmd)
+        else:
+            ret = command_handler(cmd)
         if ret == Status.QUIT:
             break
+
+    if _family is not None:
+        _family.close()
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+import importlib.resources
+import json
+import random
+import time
+from datetime import timedelta
+
+from crapi import crapi
+from history import history
+from spreadsheet import spreadsheet
+from utils import datetime_wrapper, metrics
+
+# Jobs in the order they run within a tick
+JOBS = ("members", "trophy", "donation", "racelog", "history")
+# Jobs served by one members fetch per tick
+MEMBER_JOBS = ("members", "trophy", "donation", "history")
+# Jobs checking the latest race before running
+RACELOG_JOBS = ("racelog", "history")
+
+# Seconds slept at most at once, so the daemon stays responsive
+MAX_SLEEP = 60
+
+# (name, min, max) of the five cron fields
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 6),
+)
+
+
+def _parse_field(field, low, high):
+    """Parse a cron field into the set of allowed values.
+
+    Examples
+    --------
+    >>> sorted(_parse_field("*/15", 0, 59))
+    [0, 15, 30, 45]
+
+    >>> sorted(_parse_field("1-5,7", 0, 7))
+    [1, 2, 3, 4, 5, 7]
+    """
+    values = set()
+    for part in field.split(","):
+        range_part, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if range_part == "*":
+            start, end = low, high
+        elif "-" in range_part:
+            start, end = (int(v) for v in range_part.split("-"))
+        else:
+            start = int(range_part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Schedule of a cron expression "minute hour day month weekday".
+
+    Weekdays start from Sunday (0, 7 is accepted as Sunday too). When both
+    day and weekday are restricted, either of them matches, as in cron.
+
+    Parameters
+    ----------
+    expr : str
+        Cron expression, e.g. "50 23 * * *".
+    """
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError(f"Invalid cron expression: {expr}")
+
+        self.expr = expr
+        (
+            self.__minutes,
+            self.__hours,
+            self.__days,
+            self.__months,
+            self.__weekdays,
+        ) = (
+            _parse_field(field, low, high + (name == "weekday"))
+            for field, (name, low, high) in zip(fields, CRON_FIELDS)
+        )
+        if 7 in self.__weekdays:
+            self.__weekdays = (self.__weekdays - {7}) | {0}
+        self.__any_day = fields[2] == "*"
+        self.__any_weekday = fields[4] == "*"
+
+    def __match_day(self, dt):
+        # datetime counts weekdays from Monday
+        weekday = (dt.weekday() + 1) % 7
+        in_days = dt.day in self.__days
+        in_weekdays = weekday in self.__weekdays
+        if self.__any_day or self.__any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def get_next(self, dt):
+        """Get the first time matched after dt.
+
+        Examples
+        --------
+        >>> from datetime import datetime
+        >>> CronSchedule("50 23 * * *").get_next(datetime(2024, 1, 1, 23, 50))
+        datetime.datetime(2024, 1, 2, 23, 50)
+
+        >>> CronSchedule("0 12 * * 1").get_next(datetime(2024, 1, 1, 13, 0))
+        datetime.datetime(2024, 1, 8, 12, 0)
+        """
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Every matched time repeats within 4 years (Feb 29)
+        end = dt + timedelta(days=366 * 4 + 1)
+        while dt < end:
+            if dt.month not in self.__months:
+                month = dt.month % 12 + 1
+                year = dt.year + (dt.month == 12)
+                dt = dt.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self.__match_day(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.__hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.__minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"Cron expression never matches: {self.expr}")
+
+
+def get_members_fingerprint(job, members, date):
+    """Get what the job writes from members, to skip runs with no change."""
+    if job == "members":
+        return tuple(sorted(members))
+    if job == "trophy":
+        return tuple(
+            sorted((tag, m.get("bestTrophies")) for tag, m in members.items())
+        )
+    if job == "donation":
+        return (date,) + tuple(
+            sorted((tag, m["donations"]) for tag, m in members.items())
+        )
+    # History keeps every tracked field
+    return tuple(
+        sorted(
+            (tag,) + tuple(m.get(key) for _, key in history.MEMBER_FIELDS)
+            for tag, m in members.items()
+        )
+    )
+
+
+class Daemon:
+    """Headless runner of the update jobs on cron schedules.
+
+    Jobs due in the same tick run one after another, sharing one members
+    fetch. A job is skipped when the data it depends on has not changed
+    since its last successful run. Runs never overlap: a tick finishes
+    before the next one is planned, and missed times are run once.
+
+    Schedules are read from config/schedule.json, each time is delayed by a
+    random jitter so that clients do not hit the API at once.
+    """
+
+    def __init__(self, sheet=None, client=None):
+        with importlib.resources.open_text("config", "schedule.json") as schedule_file:
+            schedule_config = json.load(schedule_file)
+            schedule_file.close()
+        self.__jitter = schedule_config.get("jitter") or 0
+        self.__schedules = {}
+        for job in schedule_config.get("jobs") or []:
+            if job["name"] not in JOBS:
+                raise ValueError(f"Unknown job: {job['name']}")
+            self.__schedules[job["name"]] = CronSchedule(job["cron"])
+
+        self.__sheet = sheet
+        self.__crapi = client or crapi.CRAPI()
+        self.__history = history.History(self.__crapi.get_clan_tag())
+        # job -> fingerprint of the data of its last successful run
+        self.__fingerprints = {}
+        self.__next_runs = {}
+
+    def __get_sheet(self):
+        if self.__sheet is None:
+            self.__sheet = spreadsheet.Sheet()
+        return self.__sheet
+
+    def __plan(self, job, now):
+        next_run = self.__schedules[job].get_next(now)
+        next_run += timedelta(seconds=random.uniform(0, self.__jitter))
+        self.__next_runs[job] = next_run
+
+    def __run_job(self, job, members):
+        if job == "members":
+            self.__get_sheet().update_members(members=members, sync_history=False)
+        elif job == "trophy":
+            self.__get_sheet().update_trophies(members=members, sync_history=False)
+        elif job == "donation":
+            self.__get_sheet().update_donations(members=members, sync_history=False)
+        elif job == "racelog":
+            self.__get_sheet().update_racelog()
+        elif job == "history":
+            # Members were stored by run_tick
+            racelog = self.__crapi.get_snapshot().racelog
+            if racelog:
+                self.__history.sync_racelog(racelog)
+
+    def run_tick(self, jobs):
+        """Run due jobs once, sharing fetched data.
+
+        Parameters
+        ----------
+        jobs : list
+            Names of the due jobs.
+        """
+        jobs = [job for job in JOBS if job in jobs]
+        date = datetime_wrapper.get_date_str(datetime_wrapper.get_now())
+
+        members = None
+        if any(job in MEMBER_JOBS for job in jobs):
+            # Later jobs of the tick share this snapshot while it is fresh
+            members = self.__crapi.get_snapshot(refresh=True).members
+            if not members:
+                print("Error: Failed to retrieve members, member jobs are skipped")
+                jobs = [job for job in jobs if job not in MEMBER_JOBS]
+            else:
+                # Stored once for all member jobs of the tick
+                try:
+                    self.__history.sync_members(members)
+                except Exception as e:
+                    print("Error: Failed to store members in history", e)
+
+        racelog_date = None
+        if any(job in RACELOG_JOBS for job in jobs):
+            latest = self.__crapi.get_racelog(limit=1)
+            racelog_date = latest[0]["createdDate"] if latest else None
+
+        for job in jobs:
+            fingerprint = (
+                get_members_fingerprint(job, members, date)
+                if job in MEMBER_JOBS
+                else None,
+                racelog_date if job in RACELOG_JOBS else None,
+            )
+            if self.__fingerprints.get(job) == fingerprint:
+                print(f"Job {job}: nothing changed, skipped")
+                metrics.incr("daemon.skipped")
+                continue
+
+            print(f"Job {job}: running")
+            try:
+                with metrics.operation(f"daemon {job}"):
+                    self.__run_job(job, members)
+            except Exception as e:
+                print(f"Error: Job {job} failed", e)
+                metrics.incr("daemon.failed")
+                continue
+            self.__fingerprints[job] = fingerprint
+
+    def run(self):
+        """Run jobs on their schedules until interrupted."""
+        if not self.__schedules:
+            print("沒有設定排程，請編輯 config/schedule.json")
+            return
+
+        now = datetime_wrapper.get_now()
+        for job in self.__schedules:
+            self.__plan(job, now)
+            print(f"Job {job}: next run at {self.__next_runs[job]:%Y-%m-%d %H:%M:%S}")
+
+        while True:
+            now = datetime_wrapper.get_now()
+            due = [job for job, run_at in self.__next_runs.items() if run_at <= now]
+            if not due:
+                wait = (min(self.__next_runs.values()) - now).total_seconds()
+                time.sleep(min(max(wait, 0), MAX_SLEEP))
+                continue
+
+            self.run_tick(due)
+
+            # Plan from the end of the tick, so missed times are not queued
+            now = datetime_wrapper.get_now()
+            for job in due:
+                self.__plan(job, now)
+                print(
+                    f"Job {job}: next run at {self.__next_runs[job]:%Y-%m-%d %H:%M:%S}"
+                )
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+from utils import metrics
+
+# Default of WriteBuffer.set: leave the field of the cell untouched
+KEEP = object()
+
+
+def _extended_value(value):
+    """Convert a python value to Sheets API ExtendedValue.
+
+    Strings are parsed like user input, so numbers stay numbers in the sheet.
+    ExtendedValue dictionaries are passed as is.
+
+    Examples
+    --------
+    >>> _extended_value(42)
+    {'numberValue': 42}
+
+    >>> _extended_value({"stringValue": "007"})
+    {'stringValue': '007'}
+
+    >>> _extended_value("42")
+    {'numberValue': 42}
+
+    >>> _extended_value("nan")
+    {'stringValue': 'nan'}
+
+    >>> _extended_value("捐贈 01/02")
+    {'stringValue': '捐贈 01/02'}
+    """
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, (int, float)):
+        return {"numberValue": value}
+
+    value = str(value)
+    if value.startswith("="):
+        return {"formulaValue": value}
+    for number_type in (int, float):
+        try:
+            number = number_type(value)
+        except ValueError:
+            continue
+        # Keep names like "nan" or "Infinity" as text
+        if math.isfinite(number):
+            return {"numberValue": number}
+        break
+    return {"stringValue": value}
+
+
+def _color(color):
+    """Convert color tuple (red, green, blue, alpha) to Sheets API Color."""
+    red, green, blue, alpha = color
+    return {"red": red, "green": green, "blue": blue, "alpha": alpha}
+
+
+def _note_data(note):
+    return {"note": note}
+
+
+def _color_data(color):
+    return {"userEnteredFormat": {"backgroundColor": _color(color)}}
+
+
+def merge_ranges(positions):
+    """Merge cell positions into rectangles.
+
+    Cells are joined into vertical runs of each column first, then runs
+    covering the same rows in adjacent columns are joined.
+
+    Parameters
+    ----------
+    positions : iterable
+        (row, col) of cells, starts from 1.
+
+    Returns
+    -------
+    rects : list
+        (row_start, row_end, col_start, col_end), ends included.
+
+    Examples
+    --------
+    >>> merge_ranges([(2, 1), (3, 1), (2, 2), (3, 2), (5, 2)])
+    [(2, 3, 1, 2), (5, 5, 2, 2)]
+
+    >>> merge_ranges([(1, 1), (1, 2), (1, 4)])
+    [(1, 1, 1, 2), (1, 1, 4, 4)]
+    """
+    rows_of_col = {}
+    for row, col in positions:
+        rows_of_col.setdefault(col, []).append(row)
+
+    runs = []
+    for col in sorted(rows_of_col):
+        rows = sorted(rows_of_col[col])
+        start = end = rows[0]
+        for row in rows[1:]:
+            if row != end + 1:
+                runs.append((start, end, col))
+                start = row
+            end = row
+        runs.append((start, end, col))
+
+    rects = []
+    # (row_start, row_end) -> the rectangle reaching the latest column
+    last_rects = {}
+    for start, end, col in runs:
+        rect = last_rects.get((start, end))
+        if rect is not None and rect[3] == col - 1:
+            rect[3] = col
+        else:
+            rect = [start, end, col, col]
+            last_rects[(start, end)] = rect
+            rects.append(rect)
+
+    return [tuple(rect) for rect in rects]
+
+
+class WriteBuffer:
+    """Collect cell writes of a worksheet and send them in one request.
+
+    Each cell may carry a value, a note and a background color. Nothing is
+    sent until `flush` is called, then changes are merged into rectangular
+    ranges of one spreadsheets.batchUpdate.
+
+    Rows and columns inserted or deleted are sent in the same request, in
+    the order they were buffered and before any cell. Cell positions refer
+    to the layout after them.
+    """
+
+    def __init__(self, sheet):
+        self.__sheet = sheet
+        # (row, col) -> {"value": ..., "note": ..., "color": ...}
+        self.__cells = {}
+        # insertDimension / deleteDimension requests
+        self.__dimensions = []
+
+    def __len__(self):
+        return len(self.__cells)
+
+    def set(self, pos, value=KEEP, note=KEEP, color=KEEP):
+        """Buffer changes of a cell.
+
+        Parameters
+        ----------
+        pos : tuple
+            (row, col) of the cell, starts from 1.
+        value : str, number or dictionary
+            New value, None to clear. Dictionaries are ExtendedValue.
+        note : str
+            New note, None to clear.
+        color : tuple
+            New background color (red, green, blue, alpha), None to clear.
+        """
+        cell = self.__cells.setdefault(tuple(pos), {})
+        if value is not KEEP:
+            cell["value"] = value
+        if note is not KEEP:
+            cell["note"] = note
+        if color is not KEEP:
+            cell["color"] = color
+
+    def __dimension_range(self, dimension, start, number):
+        return {
+            "sheetId": self.__sheet.id,
+            "dimension": dimension,
+            "startIndex": start,
+            "endIndex": start + number,
+        }
+
+    def insert_rows(self, row, number=1):
+        """Buffer inserting empty rows after the given row (0 for the top)."""
+        self.__dimensions.append(
+            {
+                "insertDimension": {
+                    "range": self.__dimension_range("ROWS", row, number),
+                    "inheritFromBefore": False,
+                }
+            }
+        )
+
+    def insert_cols(self, col, number=1):
+        """Buffer inserting empty columns after the given column."""
+        self.__dimensions.append(
+            {
+                "insertDimension": {
+                    "range": self.__dimension_range("COLUMNS", col, number),
+                    "inheritFromBefore": False,
+                }
+            }
+        )
+
+    def delete_rows(self, index, number=1):
+        """Buffer deleting rows from the given row (starts from 1)."""
+        self.__dimensions.append(
+            {
+                "deleteDimension": {
+                    "range": self.__dimension_range("ROWS", index - 1, number)
+                }
+            }
+        )
+
+    def clear(self):
+        self.__cells = {}
+        self.__dimensions = []
+
+    def __grid_range(self, rect):
+        row_start, row_end, col_start, col_end = rect
+        return {
+            "sheetId": self.__sheet.id,
+            "startRowIndex": row_start - 1,
+            "endRowIndex": row_end,
+            "startColumnIndex": col_start - 1,
+            "endColumnIndex": col_end,
+        }
+
+    def __build_requests(self):
+        requests = list(self.__dimensions)
+
+        # Values differ from cell to cell, one updateCells per rectangle
+        value_cells = {
+            pos: cell["value"] for pos, cell in self.__cells.items() if "value" in cell
+        }
+        for rect in merge_ranges(value_cells):
+            row_start, row_end, col_start, col_end = rect
+            rows = []
+            for row in range(row_start, row_end + 1):
+                values = []
+                for col in range(col_start, col_end + 1):
+                    value = value_cells[(row, col)]
+                    # Fields listed without data are cleared
+                    values.append(
+                        {}
+                        if value is None
+                        else {"userEnteredValue": _extended_value(value)}
+                    )
+                rows.append({"values": values})
+            requests.append(
+                {
+                    "updateCells": {
+                        "range": self.__grid_range(rect),
+                        "rows": rows,
+                        "fields": "userEnteredValue",
+                    }
+                }
+            )
+
+        # Notes and colors repeat, one repeatCell per rectangle of the same one
+        for field, mask, to_cell_data in (
+            ("note", "note", _note_data),
+            ("color", "userEnteredFormat.backgroundColor", _color_data),
+        ):
+            groups = {}
+            for pos, cell in self.__cells.items():
+                if field in cell:
+                    groups.setdefault(cell[field], []).append(pos)
+            for data, positions in groups.items():
+                cell_data = {} if data is None else to_cell_data(data)
+                for rect in merge_ranges(positions):
+                    requests.append(
+                        {
+                            "repeatCell": {
+                                "range": self.__grid_range(rect),
+                                "cell": cell_data,
+                                "fields": mask,
+                            }
+                        }
+                    )
+
+        return requests
+
+    def flush(self):
+        """Send all buffered changes in one batchUpdate request.
+
+        Returns
+        -------
+        num_cells : int
+            Number of cells written.
+        """
+        requests = self.__build_requests()
+        if not requests:
+            self.clear()
+            return 0
+
+        sheet = self.__sheet
+        with metrics.call("sheets", "batch_update"):
+            sheet.client.sheet.batch_update(sheet.spreadsheet.id, requests)
+        num_cells = len(self)
+        metrics.incr("sheets.requests", len(requests))
+        metrics.incr("sheets.cells_written", num_cells)
+        self.clear()
+        return num_cells
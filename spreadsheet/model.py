@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+from utils import metrics
+
+FORMAT_FIELDS = (
+    "sheets/data/rowData/values(userEnteredValue,note,userEnteredFormat/backgroundColor)"
+)
+FIELDS = ("value", "note", "color")
+
+
+def col_label(col):
+    """Get A1 notation label of a column.
+
+    Parameters
+    ----------
+    col : int
+        Column index, starts from 1.
+
+    Examples
+    --------
+    >>> col_label(1)
+    'A'
+
+    >>> col_label(28)
+    'AB'
+    """
+    label = ""
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        label = chr(ord("A") + rem) + label
+    return label
+
+
+def _color_from_api(color):
+    """Convert Sheets API Color to tuple (red, green, blue, alpha)."""
+    if color is None:
+        return None
+    return tuple(color.get(key, 0) for key in ("red", "green", "blue", "alpha"))
+
+
+def _shift(cells, axis, index, delta):
+    """Move cells along an axis to follow inserted or deleted rows/columns.
+
+    Parameters
+    ----------
+    cells : dictionary
+        Use (row, col) as key.
+    axis : int
+        0 for rows, 1 for columns.
+    index : int
+        Cells at or after this index are moved.
+    delta : int
+        Positive to insert, negative to delete.
+    """
+    shifted = {}
+    for pos, cell in cells.items():
+        if pos[axis] >= index:
+            if delta < 0 and pos[axis] < index - delta:
+                # Deleted
+                continue
+            pos = (pos[0] + delta, pos[1]) if axis == 0 else (pos[0], pos[1] + delta)
+        shifted[pos] = cell
+    return shifted
+
+
+class SheetModel:
+    """Local shadow of a worksheet: values, notes and background colors.
+
+    Values are the displayed strings. The entered value (Sheets API
+    ExtendedValue, e.g. a formula) of a loaded cell is kept beside it, and
+    is written instead of the string when the cell is moved with it.
+
+    Cells are changed in memory. `diff` compares them with the snapshot taken
+    at the last `commit`, so only changed cells have to be sent. Rows and
+    columns inserted or deleted remotely must be mirrored with the structural
+    methods, which move the snapshot as well.
+
+    Row and column indices start from 1.
+    """
+
+    def __init__(self, rows, cols, values=None, notes=None, colors=None, entered=None):
+        self.__rows = rows
+        self.__cols = cols
+        # field -> {(row, col): value / note / color}, empty cells are absent
+        self.__cells = {
+            "value": values or {},
+            "note": notes or {},
+            "color": colors or {},
+        }
+        # (row, col) -> ExtendedValue the displayed value came from
+        self.__entered = entered or {}
+        self.__snapshot = {}
+        self.commit()
+
+    @classmethod
+    def load(cls, sheet):
+        """Load a worksheet with one values read and one formatting read.
+
+        Parameters
+        ----------
+        sheet : pygsheets.Worksheet
+            Worksheet to be loaded.
+
+        Returns
+        -------
+        model : SheetModel
+        """
+        with metrics.call("sheets", "get_all_values"):
+            matrix = sheet.get_all_values(
+                include_tailing_empty=False, include_tailing_empty_rows=False
+            )
+        values = {}
+        for row_index, row in enumerate(matrix, start=1):
+            for col_index, value in enumerate(row, start=1):
+                if value != "":
+                    values[(row_index, col_index)] = value
+
+        notes = {}
+        colors = {}
+        entered = {}
+        if matrix:
+            end = f"{col_label(sheet.cols)}{len(matrix)}"
+            with metrics.call("sheets", "get"):
+                resp = sheet.client.sheet.get(
+                    sheet.spreadsheet.id,
+                    ranges=f"'{sheet.title}'!A1:{end}",
+                    includeGridData=True,
+                    fields=FORMAT_FIELDS,
+                )
+            data = resp["sheets"][0]["data"][0]
+            for row_index, row_data in enumerate(data.get("rowData", []), start=1):
+                for col_index, cell_data in enumerate(
+                    row_data.get("values", []), start=1
+                ):
+                    pos = (row_index, col_index)
+                    if cell_data.get("userEnteredValue"):
+                        entered[pos] = cell_data["userEnteredValue"]
+                    if cell_data.get("note"):
+                        notes[pos] = cell_data["note"]
+                    color = _color_from_api(
+                        cell_data.get("userEnteredFormat", {}).get("backgroundColor")
+                    )
+                    if color is not None:
+                        colors[pos] = color
+
+        return cls(
+            sheet.rows,
+            sheet.cols,
+            values=values,
+            notes=notes,
+            colors=colors,
+            entered=entered,
+        )
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def cols(self):
+        return self.__cols
+
+    def __set(self, field, row, col, data):
+        if data is None or data == "":
+            self.__cells[field].pop((row, col), None)
+        else:
+            self.__cells[field][(row, col)] = data
+
+    def get_value(self, row, col):
+        return self.__cells["value"].get((row, col), "")
+
+    def set_value(self, row, col, value, entered=None):
+        """Set the displayed value of a cell.
+
+        Parameters
+        ----------
+        value : str or number
+            New value, None to clear. Written like user input, so numeric
+            strings become numbers.
+        entered : dictionary
+            ExtendedValue written instead, e.g. from `get_entered_value` of
+            another cell.
+        """
+        self.__set("value", row, col, None if value is None else str(value))
+        if entered is None or value is None:
+            self.__entered.pop((row, col), None)
+        else:
+            self.__entered[(row, col)] = entered
+
+    def get_entered_value(self, row, col):
+        """Get ExtendedValue of the cell, None if unknown."""
+        return self.__entered.get((row, col))
+
+    def get_note(self, row, col):
+        return self.__cells["note"].get((row, col))
+
+    def set_note(self, row, col, note):
+        self.__set("note", row, col, note)
+
+    def get_color(self, row, col):
+        return self.__cells["color"].get((row, col))
+
+    def set_color(self, row, col, color):
+        self.__set("color", row, col, None if color is None else tuple(color))
+
+    def get_row(self, row):
+        """Get values of a row, from the first to the last column."""
+        return [self.get_value(row, col) for col in range(1, self.__cols + 1)]
+
+    def get_col(self, col):
+        """Get values of a column, from the first to the last row."""
+        return [self.get_value(row, col) for row in range(1, self.__rows + 1)]
+
+    def __shift(self, axis, index, delta):
+        for cells in (self.__cells, self.__snapshot):
+            for field in FIELDS:
+                cells[field] = _shift(cells[field], axis, index, delta)
+        self.__entered = _shift(self.__entered, axis, index, delta)
+
+    def insert_rows(self, row, number=1):
+        """Mirror rows inserted after the given row."""
+        self.__shift(0, row + 1, number)
+        self.__rows += number
+
+    def delete_rows(self, index, number=1):
+        """Mirror rows deleted from the given row."""
+        self.__shift(0, index, -number)
+        self.__rows -= number
+
+    def insert_cols(self, col, number=1):
+        """Mirror columns inserted after the given column."""
+        self.__shift(1, col + 1, number)
+        self.__cols += number
+
+    def diff(self):
+        """Get cells changed since the last commit.
+
+        Returns
+        -------
+        changes : dictionary
+            Use (row, col) as key, changed fields as value, e.g.
+            {"value": "1", "note": None}. None means the field is cleared.
+            Values set with an entered value are that ExtendedValue.
+        """
+        changes = {}
+        for field in FIELDS:
+            current = self.__cells[field]
+            snapshot = self.__snapshot[field]
+            for pos in current.keys() | snapshot.keys():
+                new = current.get(pos)
+                if new != snapshot.get(pos):
+                    if field == "value" and new is not None:
+                        new = self.__entered.get(pos, new)
+                    changes.setdefault(pos, {})[field] = new
+        return changes
+
+    def commit(self):
+        """Take the current cells as the synced snapshot."""
+        self.__snapshot = {field: dict(self.__cells[field]) for field in FIELDS}
@@ -1,20 +1,61 @@
 # -*- coding: utf-8 -*-
 
 import datetime
+import json
 import pprint
 import sys
+import threading
 from enum import IntEnum, auto
 
-import pygsheets
-from tqdm import tqdm
-
 from config import config
 from crapi import crapi
-from utils import alignment, datetime_wrapper
+from history import history
+from utils import alignment, cache, datetime_wrapper, metrics
+
+from .buffer import WriteBuffer, merge_ranges
+from .model import SheetModel
 
 align = alignment.align
 pp = pprint.PrettyPrinter()
 
+SPREADSHEET_TITLE = "[皇室戰爭] 部落統計"
+# Keys of opened spreadsheets by title, so later opens skip the Drive search
+SPREADSHEET_KEYS_PATH = ".cache/spreadsheet_keys.json"
+
+_spreadsheet_keys_lock = threading.Lock()
+
+
+def _load_spreadsheet_keys():
+    try:
+        path = cache.get_cache_path(SPREADSHEET_KEYS_PATH)
+        with open(path, encoding="utf-8") as keys_file:
+            return json.load(keys_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_spreadsheet_key(title):
+    """Get the cached key of the spreadsheet, None if not cached."""
+    with _spreadsheet_keys_lock:
+        return _load_spreadsheet_keys().get(title)
+
+
+def set_spreadsheet_key(title, key):
+    """Cache the key of the spreadsheet, None to drop it."""
+    with _spreadsheet_keys_lock:
+        keys = _load_spreadsheet_keys()
+        if keys.get(title) == key:
+            return
+        if key is None:
+            keys.pop(title, None)
+        else:
+            keys[title] = key
+
+        try:
+            cache.write_json_atomic(cache.get_cache_path(SPREADSHEET_KEYS_PATH), keys)
+        except OSError as err:
+            print(f"Cache saving error: {err}")
+
 
 class Color:
     # In tuple (red, green, blue, alpha)
@@ -29,6 +70,20 @@ class Color:
     d_blue = (0.6431373, 0.7607843, 0.95686275, 0)
 
 
+def _to_int(value):
+    """Convert a cell value to int, -1 if it is not a number.
+
+    Examples
+    --------
+    >>> _to_int("5600"), _to_int(""), _to_int("N/A")
+    (5600, -1, -1)
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
 class RecordGenre(IntEnum):
     UNKNOWN = auto()
     WAR = auto()
@@ -36,26 +91,72 @@ class RecordGenre(IntEnum):
 
 
 class Sheet:
-    def __init__(self, index=0):
-        self.__sheet = self.__open_sheet(index)
-        self.__crapi = crapi.CRAPI()
+    def __init__(
+        self, index=0, clan_tag=None, title=SPREADSHEET_TITLE, worksheet=None
+    ):
+        """Open the worksheet of a clan.
 
-    def __open_sheet(self, index):
+        Parameters
+        ----------
+        index : int
+            Index of worksheet in spreadsheet (starts from 0).
+        clan_tag : str
+            Tag of the clan, defaults to env "CR_CLAN_TAG".
+        title : str
+            Title of the spreadsheet.
+        worksheet : pygsheets.Worksheet
+            Worksheet already opened (or a fake of it), skips authorization.
+        """
+        if worksheet is not None:
+            self.__sheet = worksheet
+        else:
+            self.__sheet = self.__open_sheet(index, title)
+        # Share the default client with manager.py when no tag is given
+        self.__crapi = crapi.CRAPI(clan_tag) if clan_tag else crapi.CRAPI()
+        self.__history = history.History(self.__crapi.get_clan_tag())
+        self.__model = None
+        self.__buffer = None
+        self.__tag_index = None
+
+    def __open_sheet(self, index, title):
         """Open worksheet.
 
         Parameters
         ----------
         index : int
             Index of worksheet in spreadsheet (starts from 0).
+        title : str
+            Title of the spreadsheet.
         """
+        # Imported on first open, commands without the sheet start faster
+        import pygsheets
+
         try:
-            client = pygsheets.authorize(service_file=config.CLIENT_SECRET_PATH)
+            with metrics.call("sheets", "authorize"):
+                client = pygsheets.authorize(service_file=config.CLIENT_SECRET_PATH)
         except Exception:
             return None
 
+        # Open by the cached key first, opening by title searches the Drive
+        spreadsheet = None
+        key = get_spreadsheet_key(title)
+        if key:
+            try:
+                with metrics.call("sheets", "open_by_key"):
+                    spreadsheet = client.open_by_key(key)
+            except Exception:
+                spreadsheet = None
+            if spreadsheet is None or spreadsheet.title != title:
+                # Deleted, unshared or renamed since cached
+                spreadsheet = None
+                set_spreadsheet_key(title, None)
+
         # Open a worksheet from spreadsheet
         try:
-            spreadsheet = client.open("[皇室戰爭] 部落統計")
+            if spreadsheet is None:
+                with metrics.call("sheets", "open"):
+                    spreadsheet = client.open(title)
+                set_spreadsheet_key(title, spreadsheet.id)
             sheet = spreadsheet.worksheet("index", index)
         except Exception:
             return None
@@ -73,184 +174,407 @@ class Sheet:
 
     def __set_frozen_cols(self, num_cols):
         sheet = self.__check_sheet()
-        sheet.frozen_cols = num_cols
+        with metrics.call("sheets", "frozen_cols"):
+            sheet.frozen_cols = num_cols
 
-    def __get_tag_cells(self):
+    def __load_model(self):
+        """Load the worksheet into a local model and drop derived indices."""
         sheet = self.__check_sheet()
-        tag_cell = sheet.find("標籤")[0]
-        tag_cell.link(sheet)
-        start = tag_cell.neighbour("bottom")
-        end = start
-        while end.neighbour("bottom").value != "":
-            end = end.neighbour("bottom")
+        self.__model = SheetModel.load(sheet)
+        # Unsent rows and columns belong to the dropped model
+        self.__buffer = None
+        self.__invalidate_tag_index()
+        return self.__model
+
+    def __get_model(self):
+        if self.__model is None:
+            return self.__load_model()
+        return self.__model
+
+    def __get_members(self, members=None):
+        """Get members given, from a fresh clan snapshot, or fetched alone.
+
+        Only members are fetched, the race and racelog of a full snapshot
+        are left to update all and the daemon.
+        """
+        if members:
+            return members
+        snapshot = self.__crapi.get_fresh_snapshot()
+        if snapshot is not None:
+            return snapshot.members
+        return self.__crapi.get_members_dic()
+
+    def __get_buffer(self):
+        if self.__buffer is None:
+            self.__buffer = WriteBuffer(self.__check_sheet())
+        return self.__buffer
+
+    def __sync(self):
+        """Send changes of the local model in one batchUpdate request."""
+        if self.__model is None:
+            # Nothing changed since the model was dropped
+            return
 
-        tag_cells = [
-            list[0]
-            for list in sheet.range(start.label + ":" + end.label, returnas="cells")
-        ]
+        buffer = self.__get_buffer()
+        for pos, changes in self.__model.diff().items():
+            buffer.set(pos, **changes)
+        buffer.flush()
+        self.__model.commit()
+
+    def __insert_cols(self, col, number=1):
+        """Insert empty columns after the given column, sent on next sync."""
+        self.__get_model().insert_cols(col, number)
+        self.__get_buffer().insert_cols(col, number)
+
+    def __insert_rows(self, row, number=1):
+        """Insert empty rows after the given row, sent on next sync."""
+        self.__get_model().insert_rows(row, number)
+        self.__get_buffer().insert_rows(row, number)
+        self.__invalidate_tag_index()
+
+    def __delete_rows(self, index, number=1):
+        """Delete rows from the given row, sent on next sync."""
+        self.__get_model().delete_rows(index, number)
+        self.__get_buffer().delete_rows(index, number)
+        self.__invalidate_tag_index()
+
+    def __get_header_col(self, header):
+        """Get column index of the header (starts from 1)."""
+        return self.__get_model().get_row(1).index(header) + 1
+
+    def __get_tag_index(self):
+        """Get row indices of members by tag.
+
+        The index is built from the local model and reused until rows are
+        inserted, deleted or sorted.
+
+        Returns
+        -------
+        tag_index : dictionary
+            Use tag as key, row index as value, ordered by row.
+        """
+        if self.__tag_index is not None:
+            return self.__tag_index
 
-        return tag_cells
+        model = self.__get_model()
+        tag_col = self.__get_header_col("標籤")
 
-    def __sort_by_trophies(self, last_updated_row_index=51):
-        sheet = self.__check_sheet()
+        tag_index = {}
+        # Members are listed below the header until the first empty cell
+        for row_index in range(2, model.rows + 1):
+            tag = model.get_value(row_index, tag_col)
+            if tag == "":
+                break
+            tag_index[tag] = row_index
+        self.__tag_index = tag_index
+
+        return tag_index
+
+    def __invalidate_tag_index(self):
+        self.__tag_index = None
+
+    def __get_last_member_row(self):
+        tag_index = self.__get_tag_index()
+        return max(tag_index.values()) if tag_index else 1
+
+    def __sort_by_trophies(self):
+        """Order the member rows by best trophies, locally.
+
+        Ties are broken by role, then by name, and rows in the same place
+        are left untouched, so only moved rows are sent on next sync.
+
+        Moved rows keep their entered values, notes and background colors.
+        Other formats (fonts, borders, number formats) stay with the row
+        position, and formulas are moved as written, references unchanged.
+        Cells whose entered value is unknown are moved as text, so names
+        and tags like "007" are not turned into numbers.
+        """
+        model = self.__get_model()
+        tag_index = self.__get_tag_index()
+        rows = list(tag_index.values())
+        if len(rows) < 2:
+            return
 
         print("Sorting by trophies...")
-        # basecolumnindex starts from 0
-        sheet.sort_range(
-            start=(2, 1),
-            end=(last_updated_row_index, sheet.cols),
-            basecolumnindex=sheet.find("最高盃數")[0].col - 1,
-            sortorder="DESCENDING",
-        )
+        trophy_col = self.__get_header_col("最高盃數")
+        role_col = self.__get_header_col("職位")
+        name_col = self.__get_header_col("帳號")
+
+        def sort_key(row_index):
+            return (
+                -_to_int(model.get_value(row_index, trophy_col)),
+                -_to_int(model.get_value(row_index, role_col)),
+                model.get_value(row_index, name_col),
+            )
+
+        order = sorted(rows, key=sort_key)
+        cells = {
+            row_index: [
+                (
+                    model.get_value(row_index, col_index),
+                    model.get_entered_value(row_index, col_index),
+                    model.get_note(row_index, col_index),
+                    model.get_color(row_index, col_index),
+                )
+                for col_index in range(1, model.cols + 1)
+            ]
+            for row_index in rows
+        }
+        num_moved = 0
+        for row_index, from_row_index in zip(rows, order):
+            if row_index == from_row_index:
+                continue
+            for col_index, (value, entered, note, color) in enumerate(
+                cells[from_row_index], start=1
+            ):
+                if entered is None and value:
+                    entered = {"stringValue": value}
+                model.set_value(row_index, col_index, value, entered=entered)
+                model.set_note(row_index, col_index, note)
+                model.set_color(row_index, col_index, color)
+            num_moved += 1
+        self.__invalidate_tag_index()
+
+        print(f"Sorted by trophies ({num_moved} rows moved)")
+
+    def __find_latest_record(self, war_keyword):
+        """Find the latest recorded column by notes of headers.
+
+        Parameters
+        ----------
+        war_keyword : str
+            Keyword in notes of race headers.
+
+        Returns
+        -------
+        genre : RecordGenre
+        date : str
+            Recorded date in YYYYMMDD, None if not found.
+        col_offset : int
+            Offset of the column from the last column.
+        """
+        model = self.__get_model()
+        for col_index in range(model.cols, 0, -1):
+            note = model.get_note(1, col_index)
+            if note is not None:
+                try:
+                    if note.split()[0] == war_keyword:
+                        genre = RecordGenre.WAR
+                    elif note.split()[0] == "統計日":
+                        genre = RecordGenre.DONATE
+                    else:
+                        genre = RecordGenre.UNKNOWN
+                    date = note.split()[1]
+                    return genre, date, model.cols - col_index
+                except Exception:
+                    continue
 
-        print("Sorted by trophies")
+        return RecordGenre.UNKNOWN, None, 0
 
     def init(self):
         sheet = self.__check_sheet()
-        header_cells = sheet.get_row(1, returnas="cells")
+        model = self.__load_model()
 
         # Setup headers
-        for header_cell in header_cells:
-            header_cell.color = Color.grey
-        header_cells[0].value = "帳號"
-        header_cells[1].value = "標籤"
-        header_cells[2].value = "最高盃數"
-        header_cells[3].value = "職位"
-        header_cells[3].note = "首領 3\n副首 2\n長老 1\n成員 0"
-        sheet.adjust_column_width(start=0, pixel_size=120)
-        sheet.adjust_column_width(start=2, pixel_size=60)
-        sheet.adjust_column_width(start=3, pixel_size=60)
+        for col_index in range(1, model.cols + 1):
+            model.set_color(1, col_index, Color.grey)
+        model.set_value(1, 1, "帳號")
+        model.set_value(1, 2, "標籤")
+        model.set_value(1, 3, "最高盃數")
+        model.set_value(1, 4, "職位")
+        model.set_note(1, 4, "首領 3\n副首 2\n長老 1\n成員 0")
+        self.__invalidate_tag_index()
+        for start, pixel_size in ((0, 120), (2, 60), (3, 60)):
+            with metrics.call("sheets", "adjust_column_width"):
+                sheet.adjust_column_width(start=start, pixel_size=pixel_size)
         self.__set_frozen_cols(4)
 
         # Add members
-        self.update_members()
+        self.__update_members()
+        self.__sync()
 
-    def update_members(self):
-        sheet = self.__check_sheet()
-        tag_cells = self.__get_tag_cells()
-        members = self.__crapi.get_members_dic()
+    def update_members(self, members=None, sync_history=True):
+        """Add new members and remove members who left.
+
+        Parameters
+        ----------
+        members : dictionary
+            Members already fetched (as CRAPI.get_members_dic), taken from a
+            fresh clan snapshot or fetched if None.
+        sync_history : bool
+            Store the members in the local history, False if the caller did.
+        """
+        self.__load_model()
+        self.__update_members(members, sync_history)
+        self.__sync()
+
+    def __update_members(self, members=None, sync_history=True):
+        model = self.__get_model()
+        tag_index = self.__get_tag_index()
+        members = self.__get_members(members)
 
         if not members:
             print("Error: Failed to retrieve members. 'members' is None.")
             return
+        if sync_history:
+            self.__history.sync_members(members)
 
         sheet_tags = []
-        insertable_row_index = tag_cells[len(tag_cells) - 1].row + 1
+        name_col = self.__get_header_col("標籤") - 1
+        last_member_row_index = self.__get_last_member_row()
+        insertable_row_index = last_member_row_index + 1
         last_inserted_row_index = 0
 
         # Put none exist members in list
-        member_to_remove = []
-        for tag_cell in tag_cells:
-            tag = tag_cell.value
-            try:
-                member = members[tag]
-            except Exception:
-                name = tag_cell.neighbour("left").value
-                member_to_remove.append((name, tag_cell.row))
+        rows_to_remove = []
+        for tag, row_index in tag_index.items():
+            if tag not in members:
+                name = model.get_value(row_index, name_col)
+                rows_to_remove.append(row_index)
+                print(f"Member: {align(name, length=32)} is removed")
                 continue
             sheet_tags.append(tag)
 
-        # Remove none exist members in reversed order
-        for member in reversed(member_to_remove):
-            name = member[0]
-            row_index = member[1]
-            # Insert empty row in the bottom
-            sheet.insert_rows(tag_cells[len(tag_cells) - 1].row)
-            sheet.delete_rows(row_index)
-            print(f"Member: {align(name, length=32)} is removed")
-            insertable_row_index -= 1
+        # Remove none exist members, sent with the added ones in one request
+        if rows_to_remove:
+            # Keep the number of rows by inserting empty rows in the bottom
+            self.__insert_rows(last_member_row_index, len(rows_to_remove))
+            # Delete runs of adjacent rows from the bottom, so that rows above
+            # keep their indices
+            runs = merge_ranges((row_index, 1) for row_index in rows_to_remove)
+            for row_start, row_end, _, _ in reversed(runs):
+                self.__delete_rows(row_start, row_end - row_start + 1)
+            insertable_row_index -= len(rows_to_remove)
 
         # Add new members
         tags = members.keys()
         for tag in tags:
             if tag not in sheet_tags:
                 member = members[tag]
-                row_to_fill = sheet.get_row(insertable_row_index, returnas="cells")
-                row_to_fill[0].value = member["name"]
-                row_to_fill[1].value = tag
-                row_to_fill[2].value = member["bestTrophies"]
+                row_index = insertable_row_index
+                model.set_value(row_index, 1, member["name"])
+                model.set_value(row_index, 2, tag)
+                # Fall back to current trophies if player profile is unavailable
+                model.set_value(
+                    row_index, 3, member.get("bestTrophies", member["trophies"])
+                )
                 role = member["role"]
                 if role == "leader":
-                    row_to_fill[3].value = "3"
-                    row_to_fill[3].color = Color.orange
+                    model.set_value(row_index, 4, "3")
+                    model.set_color(row_index, 4, Color.orange)
                 elif role == "coLeader":
-                    row_to_fill[3].value = "2"
-                    row_to_fill[3].color = Color.d_blue
+                    model.set_value(row_index, 4, "2")
+                    model.set_color(row_index, 4, Color.d_blue)
                 elif role == "elder":
-                    row_to_fill[3].value = "1"
-                    row_to_fill[3].color = Color.d_green
+                    model.set_value(row_index, 4, "1")
+                    model.set_color(row_index, 4, Color.d_green)
                 elif role == "member":
-                    row_to_fill[3].value = "0"
+                    model.set_value(row_index, 4, "0")
                 else:
-                    row_to_fill[3].value = "0"
+                    model.set_value(row_index, 4, "0")
                 print(f"Member: {align(member['name'], length=32)} is added")
                 last_inserted_row_index = insertable_row_index
                 insertable_row_index += 1
 
         if last_inserted_row_index > 0:
-            self.__sort_by_trophies(last_inserted_row_index)
+            self.__invalidate_tag_index()
+            self.__sort_by_trophies()
 
-    def update_trophies(self):
-        tag_cells = self.__get_tag_cells()
-        members = self.__crapi.get_members_dic()
+    def update_trophies(self, members=None, sync_history=True):
+        """Update best trophies of members and sort by them.
+
+        Parameters
+        ----------
+        members : dictionary
+            Members already fetched (as CRAPI.get_members_dic), taken from a
+            fresh clan snapshot or fetched if None.
+        sync_history : bool
+            Store the members in the local history, False if the caller did.
+        """
+        model = self.__load_model()
+        tag_index = self.__get_tag_index()
+        members = self.__get_members(members)
         last_updated_row_index = 0
 
         if not members:
             print("Error: Failed to retrieve members. 'members' is None.")
             return
+        if sync_history:
+            self.__history.sync_members(members)
 
         print("Updating trophies...")
 
-        for tag_cell in tag_cells:
-            tag = tag_cell.value
+        trophy_col = self.__get_header_col("標籤") + 1
+
+        for tag, row_index in tag_index.items():
             try:
                 member = members[tag]
             except Exception:
                 print("Warning: member tag " + tag + " do not exists")
                 continue
-            trophy_cell = tag_cell.neighbour("right")
-            if int(trophy_cell.value) < int(member["bestTrophies"]):
+            if "bestTrophies" not in member:
+                print(f"Warning: best trophies of member tag {tag} are unavailable")
+                continue
+            trophy = model.get_value(row_index, trophy_col)
+            if int(trophy) < int(member["bestTrophies"]):
                 print(
-                    f"Update member {align(member['name'], length=32)} trophies: {trophy_cell.value} -> {member['bestTrophies']}"
+                    f"Update member {align(member['name'], length=32)} trophies: {trophy} -> {member['bestTrophies']}"
                 )
-                trophy_cell.value = str(member["bestTrophies"])
-                last_updated_row_index = trophy_cell.row
+                model.set_value(row_index, trophy_col, str(member["bestTrophies"]))
+                last_updated_row_index = row_index
 
         if last_updated_row_index > 0:
-            self.__sort_by_trophies(last_updated_row_index)
+            self.__sort_by_trophies()
+            self.__sync()
             print("Trophies updated")
         else:
             print("Trophies are already up to date")
 
-    def update_racelog(self):
-        sheet = self.__check_sheet()
-        header_cells = sheet.get_row(1, returnas="cells")
+    def update_racelog(self, racelog=None):
+        """Fill races not recorded yet, one column each.
+
+        Parameters
+        ----------
+        racelog : list
+            Racelog already fetched, if None only races newer than the local
+            history are requested.
+        """
+        model = self.__load_model()
 
         # Search and set latest updated (genre, date, col_offset)
-        latest_updated_date = "00000000"
-        latest_updated_col_offset = 0
-        latest_updated_genre = RecordGenre.UNKNOWN
-        for header_cell in reversed(header_cells):
-            if header_cell.note is not None:
-                try:
-                    if header_cell.note.split()[0] == "結算日":
-                        latest_updated_genre = RecordGenre.WAR
-                    elif header_cell.note.split()[0] == "統計日":
-                        latest_updated_genre = RecordGenre.DONATE
-                    latest_updated_date = header_cell.note.split()[1]
-                    latest_updated_col_offset = sheet.cols - header_cell.col
-                    break
-                except Exception:
-                    continue
+        (
+            latest_updated_genre,
+            latest_updated_date,
+            latest_updated_col_offset,
+        ) = self.__find_latest_record("結算日")
 
         if latest_updated_genre == RecordGenre.UNKNOWN:
-            latest_updated_col_offset = sheet.cols - 4
+            latest_updated_col_offset = model.cols - 4
             latest_updated_date = "00000000"
 
-        racelog = self.__crapi.get_racelog()
+        if racelog is None:
+            racelog = self.__get_new_races()
         racelog_unrecorded_offset = -1
 
+        if racelog is None:
+            print("Warning: Failed to retrieve racelog, using local history")
+        elif racelog:
+            self.__history.sync_racelog(racelog)
+        # Render from local history, which also keeps races beyond the API log.
+        # Only races from the latest recorded day on are read, a second early
+        # since the bound is exclusive
+        after = None
+        if latest_updated_genre != RecordGenre.UNKNOWN:
+            day = datetime.datetime.strptime(latest_updated_date, "%Y%m%d")
+            after = datetime_wrapper.dt_to_str(
+                datetime_wrapper.local_to_utc(day) - datetime.timedelta(seconds=1)
+            )
+        racelog = self.__history.get_racelog(after=after)
+
         if not racelog:
+            if after is not None:
+                # Every stored race is recorded already
+                return True
             print("Error: Failed to retrieve racelog. 'racelog' is None.")
             return
 
@@ -276,13 +600,39 @@ class Sheet:
             # Keep the last column empty
             if latest_updated_col_offset <= 1:
                 # Insert and inherit from the last column
-                sheet.insert_cols(sheet.cols - 1, number=1, values=None, inherit=False)
+                self.__insert_cols(model.cols - 1)
                 latest_updated_col_offset += 1
             self.__fill_race(latest_updated_col_offset - 1, race)
             latest_updated_col_offset -= 1
 
+        self.__sync()
+
         return True
 
+    def __get_new_races(self):
+        """Get races newer than the local history, newest first.
+
+        The racelog is streamed page by page and stops at the first race
+        already stored, so older pages are never requested.
+
+        Returns
+        -------
+        racelog : list
+            Order: later to former, None if failed.
+        """
+        latest_date = self.__history.get_latest_race_date() or ""
+        racelog = []
+        try:
+            for race in self.__crapi.iter_racelog():
+                if race["createdDate"] <= latest_date:
+                    break
+                racelog.append(race)
+        except Exception as e:
+            # Races before the failed page would be missing from history
+            print("Error:", e)
+            return None
+        return racelog
+
     def __fill_race(self, col_offset, race):
         """Fill specified race records to the target column.
 
@@ -293,9 +643,9 @@ class Sheet:
         race: Object
             The race from the racelog to be recorded
         """
-        sheet = self.__check_sheet()
-        col_index = sheet.cols - col_offset
-        tag_cells = self.__get_tag_cells()
+        model = self.__get_model()
+        col_index = model.cols - col_offset
+        tag_index = self.__get_tag_index()
 
         # Get info from race
         race_end_date = datetime_wrapper.get_date_str(
@@ -318,25 +668,18 @@ class Sheet:
         section_idx = race["sectionIndex"]
         week_idx = section_idx + 1
 
-        header_cell = sheet.cell((1, col_index))
-        header_cell.value = f"部落戰 {season_id}-{week_idx}"
-        header_cell.note = "結算日 " + race_end_date
-        header_cell.color = Color.pink
+        model.set_value(1, col_index, f"部落戰 {season_id}-{week_idx}")
+        model.set_note(1, col_index, "結算日 " + race_end_date)
+        model.set_color(1, col_index, Color.pink)
 
         if not participants:
             return
 
-        # Fill race records into sheet
-        for i, p in enumerate(tqdm(participants)):
+        # Fill race records into the model
+        for i, p in enumerate(participants):
             tag = p["tag"]
-            row_index = 0
-            for tag_cell in tag_cells:
-                if tag == tag_cell.value:
-                    row_index = tag_cell.row
-                    break
-            if row_index:
-                cell = sheet.cell((row_index, col_index))
-            else:
+            row_index = tag_index.get(tag, 0)
+            if not row_index:
                 print(f"Warning: member tag {tag} does not exist")
                 continue
 
@@ -345,45 +688,50 @@ class Sheet:
 
             # Form record and fill in
             record = f"{str(fame)} ({str(decks)})"
-            cell.value = record
+            model.set_value(row_index, col_index, record)
 
             # Mark inactive members (didn't participate in war day)
             if fame == 0:
-                cell.color = Color.red
-                cell.note = "未參加"
+                model.set_color(row_index, col_index, Color.red)
+                model.set_note(row_index, col_index, "未參加")
 
             # Mark top 5 participants
             if i < 5:
-                cell.color = Color.blue
-                cell.note = f"ranking: {i + 1}"
-
-    def update_donations(self, date=None, delay=None):
-        sheet = self.__check_sheet()
-        tag_cells = self.__get_tag_cells()
-        members = self.__crapi.get_members_dic()
+                model.set_color(row_index, col_index, Color.blue)
+                model.set_note(row_index, col_index, f"ranking: {i + 1}")
+
+    def update_all(self):
+        """Update members, trophies, racelog and donations from one snapshot."""
+        snapshot = self.__crapi.get_snapshot(refresh=True)
+        if not snapshot.is_complete():
+            print("Warning: Snapshot is incomplete, some updates are skipped")
+
+        # Members are stored in the local history once, not by every update
+        if snapshot.members:
+            self.__history.sync_members(snapshot.members)
+
+        print("Updating members...")
+        self.update_members(members=snapshot.members, sync_history=False)
+        self.update_trophies(members=snapshot.members, sync_history=False)
+        print("Updating racelog...")
+        self.update_racelog(racelog=snapshot.racelog)
+        self.update_donations(members=snapshot.members, sync_history=False)
+
+    def update_donations(self, date=None, delay=None, members=None, sync_history=True):
+        model = self.__load_model()
+        tag_index = self.__get_tag_index()
+        members = self.__get_members(members)
 
         if not members:
             print("Error: Failed to retrieve members. 'members' is None.")
             return
 
-        header_cells = sheet.get_row(1, returnas="cells")
-
         # Search and set latest updated (genre, date, col_offset)
-        latest_updated_date = None
-        latest_updated_col_offset = 0
-        latest_updated_genre = RecordGenre.UNKNOWN
-        for header_cell in reversed(header_cells):
-            if header_cell.note is not None:
-                try:
-                    if header_cell.note.split()[0] == "發起日":
-                        latest_updated_genre = RecordGenre.WAR
-                    elif header_cell.note.split()[0] == "統計日":
-                        latest_updated_genre = RecordGenre.DONATE
-                    latest_updated_date = header_cell.note.split()[1]
-                    latest_updated_col_offset = sheet.cols - header_cell.col
-                    break
-                except Exception:
-                    continue
+        (
+            latest_updated_genre,
+            latest_updated_date,
+            latest_updated_col_offset,
+        ) = self.__find_latest_record("發起日")
 
         now = datetime_wrapper.get_now()
         if date:
@@ -400,37 +748,38 @@ class Sheet:
             and latest_updated_genre == RecordGenre.DONATE
         ):
             # Update the existed record
-            col_index = sheet.cols - latest_updated_col_offset
+            col_index = model.cols - latest_updated_col_offset
         else:
             # Keep the last column empty
             if latest_updated_col_offset <= 1:
                 # Insert and inherit from the last column
-                sheet.insert_cols(sheet.cols - 1, number=1, values=None, inherit=False)
+                self.__insert_cols(model.cols - 1)
                 latest_updated_col_offset += 1
             # Record in new coulumn
             col_offset = latest_updated_col_offset - 1
-            col_index = sheet.cols - col_offset
+            col_index = model.cols - col_offset
+
+        if sync_history:
+            self.__history.sync_members(members)
+        self.__history.sync_donations(members, full_date)
 
-        header_cell = sheet.cell((1, col_index))
-        header_cell.value = "捐贈 " + date
-        header_cell.note = "統計日 " + full_date
-        header_cell.color = Color.skin
+        model.set_value(1, col_index, "捐贈 " + date)
+        model.set_note(1, col_index, "統計日 " + full_date)
+        model.set_color(1, col_index, Color.skin)
 
         print(f"Updating donations {date}")
 
         # Update donations of each member
-        for tag_cell in tqdm(tag_cells):
-            tag = tag_cell.value
+        for tag, row_index in tag_index.items():
             try:
                 member = members[tag]
             except Exception:
                 print(f"Warning: member tag {tag} do not exists")
                 continue
 
-            row_index = tag_cell.row
+            model.set_value(row_index, col_index, str(member["donations"]))
 
-            cell = sheet.cell((row_index, col_index))
-            cell.value = str(member["donations"])
+        self.__sync()
 
     def __print_all(self):
         sheet = self.__check_sheet()
@@ -1,9 +1,42 @@
 # -*- coding: utf-8 -*-
 
 import re
-import unicodedata
+from bisect import bisect_right
+from functools import lru_cache
 from sys import platform as _platform
 
+from utils import width_table
+
+ansi_escape = re.compile(r"(?:\x1B[@-_]|[\x80-\x9F])[0-?]*[ -/]*[@-~]")
+
+# Ambiguous characters are rendered wide on Windows consoles only
+ambiguous_is_wide = _platform.startswith("win") or _platform.startswith("cygwin")
+
+
+def _compile(ranges):
+    """Split ranges into sorted starts and ends for bisection."""
+    return [start for start, _ in ranges], [end for _, end in ranges]
+
+
+_wide = _compile(width_table.WIDE)
+_ambiguous = _compile(width_table.AMBIGUOUS)
+_zero_width = _compile(width_table.ZERO_WIDTH)
+_pictographic = _compile(width_table.PICTOGRAPHIC)
+_emoji_modifier = _compile(width_table.EMOJI_MODIFIER)
+_regional_indicator = _compile(width_table.REGIONAL_INDICATOR)
+_tag = _compile(width_table.TAG)
+
+ZWJ = "\u200d"
+# Variation selectors of text and emoji presentation
+VS15 = "\ufe0e"
+VS16 = "\ufe0f"
+
+
+def _in_table(cp, table):
+    starts, ends = table
+    i = bisect_right(starts, cp) - 1
+    return i >= 0 and cp <= ends[i]
+
 
 def remove_ansi_escape(string):
     """Remove ANSI escape code.
@@ -32,7 +65,6 @@ def remove_ansi_escape(string):
     #             [@-~]   # Final byte
     #         )
     #     ''', re.VERBOSE)
-    ansi_escape = re.compile(r"(?:\x1B[@-_]|[\x80-\x9F])[0-?]*[ -/]*[@-~]")
     return ansi_escape.sub("", string)
 
 
@@ -52,39 +84,100 @@ def is_wide(ch):
     >>> is_wide('a')
     False
     """
-    res = unicodedata.east_asian_width(ch)
-    if res == "A":
-        # Ambiguous
-        if _platform.startswith("linux"):
-            # Linux
-            return False
-        elif _platform.startswith("win") or _platform.startswith("cygwin"):
-            # Windows
-            return True
-        elif _platform.startswith("darwin"):
-            # Mac OS X
-            return False
-        else:
-            # Other OS
-            return False
-    elif res == "F":
-        # Fullwidth
-        return True
-    elif res == "H":
-        # Halfwidth
-        return False
-    elif res == "N":
-        # Neutral (Not East Asian)
-        return False
-    elif res == "Na":
-        # Narrow
-        return False
-    elif res == "W":
-        # Wide
+    cp = ord(ch)
+    if cp < 0x1100:
+        # No wide character before Hangul Jamo
+        return ambiguous_is_wide and _in_table(cp, _ambiguous)
+    if _in_table(cp, _wide):
         return True
-    else:
-        # No such case
-        return False
+    return ambiguous_is_wide and _in_table(cp, _ambiguous)
+
+
+def is_zero_width(ch):
+    """Check is the character zero width (joined to the previous one) or not.
+
+    Combining marks, zero width space/joiners and variation selectors.
+
+    Examples
+    --------
+    >>> is_zero_width("\u200d")
+    True
+
+    >>> is_zero_width("a")
+    False
+    """
+    return _in_table(ord(ch), _zero_width)
+
+
+def iter_clusters(string):
+    """Iterate over grapheme clusters, characters shown as one.
+
+    A simplified extended grapheme cluster: a character with the combining
+    marks, variation selectors, skin tone modifiers and tags after it,
+    emoji joined by zero width joiners, or a pair of regional indicators.
+
+    Examples
+    --------
+    >>> [len(cluster) for cluster in iter_clusters("ae\u0301")]
+    [1, 2]
+
+    >>> len(list(iter_clusters("🏳️‍🌈✊🏾🇹🇼")))
+    3
+    """
+    cluster = ""
+    base = None
+    joined = False
+    for ch in string:
+        cp = ord(ch)
+        if cluster and (
+            is_zero_width(ch)
+            or _in_table(cp, _emoji_modifier)
+            or _in_table(cp, _tag)
+        ):
+            cluster += ch
+            joined = ch == ZWJ
+            continue
+        if joined and _in_table(cp, _pictographic) and _in_table(base, _pictographic):
+            # Emoji zero width joiner sequence
+            cluster += ch
+            joined = False
+            continue
+        if (
+            len(cluster) == 1
+            and _in_table(cp, _regional_indicator)
+            and _in_table(base, _regional_indicator)
+        ):
+            # Flag
+            cluster += ch
+            continue
+        if cluster:
+            yield cluster
+        cluster = ch
+        base = cp
+        joined = False
+    if cluster:
+        yield cluster
+
+
+def _get_cluster_width(cluster):
+    base = cluster[0]
+    if is_zero_width(base):
+        # If at beginning of the line alone
+        return 1
+    if len(cluster) > 1:
+        cp = ord(base)
+        if _in_table(cp, _regional_indicator):
+            return 2
+        if _in_table(cp, _pictographic) and VS15 not in cluster:
+            # Emoji presentation, skin tone, joiner or tag sequences are wide
+            for ch in cluster[1:]:
+                if (
+                    ch in (VS16, ZWJ)
+                    or _in_table(ord(ch), _emoji_modifier)
+                    or _in_table(ord(ch), _tag)
+                ):
+                    return 2
+    return 2 if is_wide(base) else 1
 
 
 def get_width(string):
@@ -104,13 +197,13 @@ def get_width(string):
     5
 
     >>> get_width("❤️")
-    1
+    2
 
     >>> get_width("✊")
     2
 
     >>> get_width("✊🏾")
-    4
+    2
 
     >>> get_width("🏳")
     1
@@ -118,9 +211,17 @@ def get_width(string):
     >>> get_width("🌈")
     2
 
-    # #TODO: Fix this test
-    # >>> get_width("🏳️‍🌈")
-    # 3
+    >>> get_width("🏳️‍🌈")
+    2
+
+    >>> get_width("🇹🇼")
+    2
+
+    >>> get_width("e\u0301")
+    1
+
+    >>> get_width("\033[94mHello\033[0m")
+    5
 
     >>> get_width("")
     0
@@ -129,37 +230,24 @@ def get_width(string):
     if not string:
         return 0
 
-    string = remove_ansi_escape(string)
+    if string.isascii():
+        # Fast path, every ASCII character is one column
+        if "\x1b" in string:
+            string = remove_ansi_escape(string)
+        return len(string)
 
-    width = 0
-    # combining_char = "[?([\u0300-\u036f]"
-    variation_selector = "[?([\ufe00-\ufe0f]"
-
-    for i in range(len(string)):
-        # Combining character
-        # if re.match(combining_char, string[i]):
-        if unicodedata.combining(string[i]):
-            if i == 0:
-                # If at beginning of the line alone
-                ch_width = 1
-            else:
-                ch_width = 0
-        elif re.match(variation_selector, string[i]):
-            if i == 0:
-                # If at beginning of the line alone
-                ch_width = 1
-            else:
-                ch_width = 0
-        # Fullwidth character
-        elif is_wide(string[i]):
-            ch_width = 2
-        # Neutral character
-        else:
-            ch_width = 1
-
-        width += ch_width
-
-    return width
+    return _get_width(string)
+
+
+@lru_cache(maxsize=4096)
+def _get_width(string):
+    """Get width of non-ASCII string, memoized for repeated names.
+
+    Each grapheme cluster takes the width of its base character, emoji
+    sequences and flags take two columns.
+    """
+    string = remove_ansi_escape(string)
+    return sum(_get_cluster_width(cluster) for cluster in iter_clusters(string))
 
 
 def align(string, dir="l", length=12):
@@ -1,7 +1,22 @@
 # -*- coding: utf-8 -*-
 
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
 import requests
-from requests.exceptions import HTTPError
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+
+from utils import metrics, ratelimit
+
+# Responses worth retrying, POST only retries on rate limiting
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+POST_RETRY_STATUSES = (429,)
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 8.0
+DEFAULT_DEADLINE = 30.0
 
 
 class API:
@@ -9,12 +24,50 @@ class API:
         headers = {"Accept": "application/json"}
         self.__base_url = ""
         self.__jwt = None
+        self.__cache = None
+        self.__max_retries = DEFAULT_MAX_RETRIES
+        self.__base_delay = DEFAULT_BASE_DELAY
+        self.__max_delay = DEFAULT_MAX_DELAY
+        self.__deadline = DEFAULT_DEADLINE
         self.__session = requests.session()
         self.__session.headers.update(headers)
 
     def set_url(self, url):
         self.__base_url = url
 
+    def set_retry(self, max_retries=None, base_delay=None, max_delay=None):
+        """Set retries of failed requests.
+
+        Parameters
+        ----------
+        max_retries : int
+            Maximum retries after the first attempt.
+        base_delay : float
+            Backoff (seconds) of the first retry, doubled for each retry.
+        max_delay : float
+            Maximum backoff (seconds) of a retry.
+        """
+        if max_retries is not None:
+            self.__max_retries = max_retries
+        if base_delay is not None:
+            self.__base_delay = base_delay
+        if max_delay is not None:
+            self.__max_delay = max_delay
+
+    def set_deadline(self, deadline):
+        """Set default time budget (seconds) of a request, retries included."""
+        self.__deadline = deadline
+
+    def set_cache(self, cache):
+        """Serve GET requests through a response cache.
+
+        Parameters
+        ----------
+        cache : utils.cache.ResponseCache
+            Cache shared by API instances, None to disable.
+        """
+        self.__cache = cache
+
     def set_jwt(self, jwt):
         self.__jwt = jwt
         headers = {"Authorization": f"Bearer {self.__jwt}"}
@@ -23,7 +76,7 @@ class API:
     def get_external_ip(self):
         req = "https://ipecho.net/plain"
         try:
-            resp = requests.get(req)
+            resp = requests.get(req, timeout=10)
         except HTTPError as http_err:
             print(f"API request HTTP error: {http_err}")
             raise
@@ -33,12 +86,85 @@ class API:
 
         return resp.text
 
-    def GET(self, query):
-        session = self.__session
+    def __send(
+        self, method, req, deadline=None, retry_statuses=RETRY_STATUSES, **kwargs
+    ):
+        """Send a request under the rate limit of the host, with retries.
+
+        Rate limited and failed requests are retried with exponential backoff
+        and jitter, following Retry-After if given, until the deadline.
+
+        Returns
+        -------
+        resp : requests.Response
+            The last response, which may still be a failure.
+        """
+        deadline = deadline or self.__deadline
+        end = time.monotonic() + deadline
+        bucket = ratelimit.get_bucket(urlsplit(req).netloc)
+        endpoint = metrics.get_endpoint(req)
+
+        attempt = 0
+        while True:
+            if bucket and not bucket.acquire(max_wait=end - time.monotonic()):
+                raise Exception(
+                    429, {"reason": f"Rate limit wait exceeds deadline {deadline}s"}
+                )
+
+            error = None
+            retry_after = None
+            metrics.incr("api.requests")
+            try:
+                with metrics.timer(f"api {method} {endpoint}"):
+                    resp = self.__session.request(
+                        method, req, timeout=max(end - time.monotonic(), 0.1), **kwargs
+                    )
+                metrics.incr(f"api.status.{resp.status_code}")
+                metrics.incr("api.bytes_sent", len(resp.request.body or b""))
+                metrics.incr("api.bytes_received", len(resp.content))
+                if resp.status_code not in retry_statuses:
+                    return resp
+                retry_after = ratelimit.get_retry_after(resp.headers)
+            except (ConnectionError, Timeout) as err:
+                metrics.incr("api.errors")
+                if method != "GET":
+                    # The request may have been processed
+                    raise
+                resp = None
+                error = err
+
+            if retry_after is not None:
+                # Jitter keeps concurrent clients from retrying at once
+                delay = retry_after + random.uniform(0, self.__base_delay)
+            else:
+                delay = ratelimit.get_backoff(
+                    attempt, self.__base_delay, self.__max_delay
+                )
+            if attempt >= self.__max_retries or time.monotonic() + delay >= end:
+                if resp is not None:
+                    return resp
+                raise error
+
+            metrics.incr("api.retries")
+            time.sleep(delay)
+            attempt += 1
+
+    def GET(self, query, deadline=None):
+        cache = self.__cache
         req = self.__base_url + query
 
+        entry = cache.get(req) if cache else None
+        headers = {}
+        if entry:
+            if cache.is_fresh(entry):
+                metrics.incr("cache.hit")
+                return json.loads(entry["body"])
+            headers = cache.get_validators(entry)
+        if cache:
+            metrics.incr("cache.miss")
+
         try:
-            resp = session.get(req)
+            resp = self.__send("GET", req, deadline=deadline, headers=headers)
         except HTTPError as http_err:
             print(f"API request HTTP error: {http_err}")
             raise
@@ -47,6 +173,12 @@ class API:
             raise
 
         status = resp.status_code
+        if status == 304 and entry:
+            # Not modified, keep using the cached body
+            metrics.incr("cache.revalidated")
+            cache.revalidate(req, resp.headers)
+            return json.loads(entry["body"])
+
         try:
             payload = resp.json()
         except Exception as err:
@@ -56,18 +188,31 @@ class API:
         if not resp.ok:
             raise Exception(status, payload)
 
+        if cache:
+            cache.put(req, resp.text, resp.headers)
+
         return payload
 
-    def POST(self, query, data=None):
-        session = self.__session
+    def POST(self, query, data=None, deadline=None):
         req = self.__base_url + query
 
         try:
             if isinstance(data, dict):
-                resp = session.post(req, json=data)
+                resp = self.__send(
+                    "POST",
+                    req,
+                    deadline=deadline,
+                    retry_statuses=POST_RETRY_STATUSES,
+                    json=data,
+                )
             else:
-                resp = session.post(
-                    req, data=data, headers={"Content-Type": "application/json"}
+                resp = self.__send(
+                    "POST",
+                    req,
+                    deadline=deadline,
+                    retry_statuses=POST_RETRY_STATUSES,
+                    data=data,
+                    headers={"Content-Type": "application/json"},
                 )
         except HTTPError as http_err:
             print(f"API request HTTP error: {http_err}")
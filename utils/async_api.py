@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from utils import metrics, ratelimit
+from utils.api import (
+    DEFAULT_BASE_DELAY,
+    DEFAULT_DEADLINE,
+    DEFAULT_MAX_DELAY,
+    DEFAULT_MAX_RETRIES,
+    RETRY_STATUSES,
+)
+
+DEFAULT_MAX_CONNECTIONS = 10
+
+
+class AsyncAPI:
+    """Asyncio counterpart of utils.api.API.
+
+    All requests share one aiohttp session (connection pool), which is opened
+    in the running event loop. Response cache and per-host rate limits are
+    shared with the synchronous clients.
+    """
+
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS):
+        self.__headers = {"Accept": "application/json"}
+        self.__base_url = ""
+        self.__cache = None
+        self.__max_connections = max_connections
+        self.__max_retries = DEFAULT_MAX_RETRIES
+        self.__base_delay = DEFAULT_BASE_DELAY
+        self.__max_delay = DEFAULT_MAX_DELAY
+        self.__deadline = DEFAULT_DEADLINE
+        self.__session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        if self.__session is None:
+            connector = aiohttp.TCPConnector(limit=self.__max_connections)
+            self.__session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    def set_url(self, url):
+        self.__base_url = url
+
+    def set_cache(self, cache):
+        self.__cache = cache
+
+    def set_jwt(self, jwt):
+        self.__headers["Authorization"] = f"Bearer {jwt}"
+
+    def set_retry(self, max_retries=None, base_delay=None, max_delay=None):
+        if max_retries is not None:
+            self.__max_retries = max_retries
+        if base_delay is not None:
+            self.__base_delay = base_delay
+        if max_delay is not None:
+            self.__max_delay = max_delay
+
+    def set_deadline(self, deadline):
+        self.__deadline = deadline
+
+    async def __send(self, method, req, deadline=None, headers=None):
+        """Send a request under the rate limit of the host, with retries.
+
+        Returns
+        -------
+        status : int
+        headers : multidict.CIMultiDictProxy
+        body : str
+            Status, headers and body of the last response.
+        """
+        await self.open()
+        deadline = deadline or self.__deadline
+        end = time.monotonic() + deadline
+        bucket = ratelimit.get_bucket(urlsplit(req).netloc)
+        headers = {**self.__headers, **(headers or {})}
+        endpoint = metrics.get_endpoint(req)
+
+        attempt = 0
+        while True:
+            if bucket:
+                wait = bucket.reserve(max_wait=end - time.monotonic())
+                if wait is None:
+                    raise Exception(
+                        429, {"reason": f"Rate limit wait exceeds deadline {deadline}s"}
+                    )
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            error = None
+            retry_after = None
+            timeout = aiohttp.ClientTimeout(total=max(end - time.monotonic(), 0.1))
+            metrics.incr("api.requests")
+            try:
+                with metrics.timer(f"api {method} {endpoint}"):
+                    async with self.__session.request(
+                        method, req, headers=headers, timeout=timeout
+                    ) as resp:
+                        status = resp.status
+                        resp_headers = resp.headers
+                        raw_body = await resp.read()
+                        body = raw_body.decode(resp.get_encoding())
+                metrics.incr(f"api.status.{status}")
+                metrics.incr("api.bytes_received", len(raw_body))
+                if status not in RETRY_STATUSES:
+                    return status, resp_headers, body
+                retry_after = ratelimit.get_retry_after(resp_headers)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                metrics.incr("api.errors")
+                status = None
+                error = err
+
+            if retry_after is not None:
+                delay = retry_after + random.uniform(0, self.__base_delay)
+            else:
+                delay = ratelimit.get_backoff(
+                    attempt, self.__base_delay, self.__max_delay
+                )
+            if attempt >= self.__max_retries or time.monotonic() + delay >= end:
+                if status is not None:
+                    return status, resp_headers, body
+                raise error
+
+            metrics.incr("api.retries")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def GET(self, query, deadline=None, jwt=None):
+        cache = self.__cache
+        req = self.__base_url + query
+
+        entry = cache.get(req) if cache else None
+        headers = {}
+        if jwt is not None:
+            # Token of this request, instead of the one shared by set_jwt
+            headers["Authorization"] = f"Bearer {jwt}"
+        if entry:
+            if cache.is_fresh(entry):
+                metrics.incr("cache.hit")
+                return json.loads(entry["body"])
+            headers.update(cache.get_validators(entry))
+        if cache:
+            metrics.incr("cache.miss")
+
+        try:
+            status, resp_headers, body = await self.__send(
+                "GET", req, deadline=deadline, headers=headers
+            )
+        except Exception as err:
+            print(f"API request other error: {err}")
+            raise
+
+        if status == 304 and entry:
+            # Not modified, keep using the cached body
+            metrics.incr("cache.revalidated")
+            cache.revalidate(req, resp_headers)
+            return json.loads(entry["body"])
+
+        try:
+            payload = json.loads(body)
+        except Exception as err:
+            print(f"Payload parsing error: {err}")
+            raise Exception(status, body)
+
+        if status >= 400:
+            raise Exception(status, payload)
+
+        if cache:
+            cache.put(req, body, resp_headers)
+
+        return payload
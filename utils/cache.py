@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import atexit
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatch
+from urllib.parse import urlsplit
+
+DEFAULT_MAX_ENTRIES = 512
+
+
+def get_cache_path(path):
+    """Place the cache file under env "CR_CACHE_DIR" if set."""
+    cache_dir = os.environ.get("CR_CACHE_DIR")
+    if path and cache_dir:
+        return os.path.join(cache_dir, os.path.basename(path))
+    return path
+
+
+def write_json_atomic(path, data):
+    """Write data to a JSON file, creating its directory.
+
+    Written to a temporary file first so a crash never leaves half a file.
+
+    Raises
+    ------
+    OSError
+        If the file cannot be written.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as json_file:
+            json.dump(data, json_file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_max_age(headers):
+    """Get max-age (seconds) from Cache-Control header.
+
+    Examples
+    --------
+    >>> get_max_age({"Cache-Control": "public, max-age=120"})
+    120
+
+    >>> get_max_age({}) is None
+    True
+    """
+    match = re.search(r"max-age=(\d+)", headers.get("Cache-Control", ""))
+    return int(match.group(1)) if match else None
+
+
+class ResponseCache:
+    """LRU cache of API responses with TTL per endpoint.
+
+    Entries are keyed by request URL and keep the raw response body, so every
+    hit returns a fresh copy. Stale entries are kept for conditional
+    revalidation (ETag / Last-Modified) until evicted.
+
+    Parameters
+    ----------
+    ttls : dictionary
+        Use endpoint pattern (e.g. "/players/*") as key, TTL in seconds as
+        value. Patterns are matched against the path of the URL. Endpoints
+        without a pattern follow Cache-Control max-age of the response.
+    max_entries : int
+        Maximum number of entries, least recently used ones are evicted.
+    path : str
+        File to persist entries across processes, None to keep in memory.
+    """
+
+    def __init__(self, ttls=None, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+        self.__ttls = ttls or {}
+        self.__max_entries = max_entries
+        self.__path = path
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__dirty = False
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def get_ttl(self, url, headers=None):
+        """Get TTL (seconds) of the URL, 0 if it should not be cached."""
+        path = urlsplit(url).path
+        for pattern, ttl in self.__ttls.items():
+            if fnmatch(path, f"*{pattern}"):
+                return ttl
+
+        max_age = get_max_age(headers or {})
+        return max_age or 0
+
+    def get(self, url):
+        """Get cached entry of the URL.
+
+        Returns
+        -------
+        entry : dictionary
+            Keys "body", "expires" and optional "etag", "last_modified".
+            None if not cached.
+        """
+        with self.__lock:
+            entry = self.__entries.get(url)
+            if entry is not None:
+                self.__entries.move_to_end(url)
+            return entry
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry["expires"] > time.time()
+
+    @staticmethod
+    def get_validators(entry):
+        """Get headers of a conditional request for the entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url, body, headers):
+        """Cache the response body of the URL.
+
+        Parameters
+        ----------
+        url : str
+            Request URL.
+        body : str
+            Raw response body.
+        headers : dictionary
+            Response headers.
+        """
+        ttl = self.get_ttl(url, headers)
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if ttl <= 0 and not etag and not last_modified:
+            return
+
+        with self.__lock:
+            self.__entries[url] = {
+                "body": body,
+                "expires": time.time() + ttl,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            self.__entries.move_to_end(url)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+            self.__dirty = True
+
+    def revalidate(self, url, headers):
+        """Renew the entry of the URL after a 304 Not Modified response."""
+        with self.__lock:
+            entry = self.__entries.get(url)
+            if entry is None:
+                return
+            entry["expires"] = time.time() + self.get_ttl(url, headers)
+            self.__dirty = True
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__dirty = True
+
+    def load(self):
+        """Load entries from the file, ignoring a missing or broken file."""
+        try:
+            with open(self.__path, encoding="utf-8") as cache_file:
+                entries = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+
+        with self.__lock:
+            self.__entries = OrderedDict(entries)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def save(self):
+        """Write entries to the file if anything changed."""
+        if not self.__path or not self.__dirty:
+            return
+
+        with self.__lock:
+            entries = list(self.__entries.items())
+            self.__dirty = False
+
+        try:
+            write_json_atomic(self.__path, OrderedDict(entries))
+        except OSError as err:
+            print(f"Cache saving error: {err}")
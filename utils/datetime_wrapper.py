@@ -40,6 +40,10 @@ def utc_to_local(dt):
     return dt.replace(tzinfo=None) + offset
 
 
+def local_to_utc(dt):
+    return dt.astimezone(timezone.utc)
+
+
 def utc_shift_tz(dt, hours=8):
     dt = dt.astimezone(timezone(offset=timedelta(hours=hours))).replace(tzinfo=None)
     return dt
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from urllib.parse import unquote, urlsplit
+
+from utils import datetime_wrapper, table
+
+# Upper bounds (seconds) of latency buckets, the last one catches the rest
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+MAX_OPERATIONS = 20
+
+
+def get_endpoint(url):
+    """Get endpoint of the URL, with tags replaced by "*".
+
+    Examples
+    --------
+    >>> get_endpoint("https://api.clashroyale.com/v1/clans/%23ABC/members")
+    '/v1/clans/*/members'
+
+    >>> get_endpoint("/players/%23P0?limit=1")
+    '/players/*'
+    """
+    segments = urlsplit(url).path.split("/")
+    return "/".join(
+        "*" if unquote(segment).startswith("#") else segment for segment in segments
+    )
+
+
+class Histogram:
+    """Latency histogram on fixed buckets."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def get_percentile(self, q):
+        """Get upper bound of the bucket holding the q-th quantile.
+
+        Examples
+        --------
+        >>> hist = Histogram()
+        >>> for seconds in (0.001, 0.02, 0.02, 0.3):
+        ...     hist.observe(seconds)
+        >>> hist.get_percentile(0.5)
+        0.025
+        >>> hist.get_percentile(1)
+        0.3
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                # The last bucket is open, and no bound exceeds the maximum
+                if i == len(LATENCY_BUCKETS):
+                    return self.max
+                return min(LATENCY_BUCKETS[i], self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "p50": self.get_percentile(0.5),
+            "p95": self.get_percentile(0.95),
+        }
+
+
+# Shared by every client of the process
+_lock = threading.Lock()
+_counters = Counter()
+_histograms = {}
+_operations = deque(maxlen=MAX_OPERATIONS)
+# Counters of the operations measuring the current context, outermost first
+_scopes = contextvars.ContextVar("metrics_scopes", default=())
+
+
+def incr(name, value=1):
+    """Add to a counter, e.g. "api.bytes_received"."""
+    with _lock:
+        _counters[name] += value
+        for scope in _scopes.get():
+            scope[name] += value
+
+
+def bind(func):
+    """Wrap a function to run in a copy of the current context.
+
+    Threads of a pool start without the context, so work submitted to one
+    is counted by the operation submitting it only if bound. Bind once per
+    submission, a context cannot run in two threads at once.
+    """
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def observe(name, seconds):
+    """Record a latency (seconds) in the histogram of the name."""
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram()
+        hist.observe(seconds)
+
+
+@contextmanager
+def timer(name):
+    """Record latency of the block in the histogram of the name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+@contextmanager
+def call(group, name):
+    """Count and time a remote call, e.g. call("sheets", "batch_update")."""
+    incr(f"{group}.calls")
+    incr(f"{group}.{name}")
+    with timer(f"{group} {name}"):
+        yield
+
+
+def get_counters():
+    with _lock:
+        return dict(_counters)
+
+
+def get_histograms():
+    with _lock:
+        return {name: hist.to_dict() for name, hist in _histograms.items()}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _operations.clear()
+
+
+def _write_record(record):
+    path = os.environ.get("CR_METRICS_PATH")
+    if not path:
+        return
+    try:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as metrics_file:
+            metrics_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print("Error: Unable to write metrics", e)
+
+
+@contextmanager
+def operation(name):
+    """Measure a command, e.g. "update racelog".
+
+    Counters changed by the block are kept with the operation, and appended
+    as one JSON line to the file of env "CR_METRICS_PATH" if set. They are
+    counted in the context of the block (its asyncio tasks and functions
+    wrapped by `bind`), so concurrent operations do not count each other.
+    """
+    scope = Counter()
+    token = _scopes.set(_scopes.get() + (scope,))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _scopes.reset(token)
+        observe(f"op {name}", seconds)
+        with _lock:
+            delta = {key: value for key, value in scope.items() if value}
+        record = {
+            "time": datetime_wrapper.get_utcnow_str(),
+            "operation": name,
+            "seconds": round(seconds, 6),
+            "counters": delta,
+        }
+        with _lock:
+            _operations.append(record)
+        _write_record(record)
+
+
+def get_operations():
+    with _lock:
+        return list(_operations)
+
+
+def show():
+    """Show counters, latency histograms and the latest operations."""
+    lines = []
+
+    operations = get_operations()
+    histograms = get_histograms()
+    counters = get_counters()
+    if not counters and not histograms:
+        print("沒有統計資料")
+        return
+
+    if operations:
+        op_table = table.Table(
+            [
+                table.Column("指令"),
+                table.Column("秒", dir="r"),
+                table.Column("API", dir="r"),
+                table.Column("Sheets", dir="r"),
+                table.Column("快取命中", dir="r"),
+            ],
+            sep="  ",
+        )
+        for record in operations:
+            delta = record["counters"]
+            op_table.add_row(
+                record["operation"],
+                f"{record['seconds']:.3f}",
+                delta.get("api.requests", 0),
+                delta.get("sheets.calls", 0),
+                delta.get("cache.hit", 0) + delta.get("cache.revalidated", 0),
+            )
+        lines += op_table.render(rule="=") + [""]
+
+    hist_table = table.Table(
+        [
+            table.Column("延遲", shrink=True),
+            table.Column("次數", dir="r"),
+            table.Column("平均", dir="r"),
+            table.Column("p50", dir="r"),
+            table.Column("p95", dir="r"),
+            table.Column("最大", dir="r"),
+        ],
+        sep="  ",
+    )
+    for name, hist in sorted(histograms.items()):
+        hist_table.add_row(
+            name,
+            hist["count"],
+            f"{hist['total'] / hist['count'] * 1000:.0f}ms",
+            f"{hist['p50'] * 1000:.0f}ms",
+            f"{hist['p95'] * 1000:.0f}ms",
+            f"{hist['max'] * 1000:.0f}ms",
+        )
+    lines += hist_table.render(rule="=") + [""]
+
+    counter_table = table.Table(
+        [table.Column("計數", shrink=True), table.Column("值", dir="r")], sep="  "
+    )
+    for name, value in sorted(counters.items()):
+        counter_table.add_row(name, value)
+    lines += counter_table.render(rule="=")
+
+    table.write(lines)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from utils import datetime_wrapper
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    capacity : float
+        Maximum number of tokens (burst size), defaults to rate.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.__rate = float(rate)
+        self.__capacity = float(capacity or rate)
+        self.__tokens = self.__capacity
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """Take a token, possibly ahead of time.
+
+        Parameters
+        ----------
+        max_wait : float
+            Maximum seconds willing to wait, None for no limit.
+
+        Returns
+        -------
+        wait : float
+            Seconds to wait before using the token. None if it exceeds
+            max_wait, in which case no token is taken.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(
+                self.__capacity,
+                self.__tokens + (now - self.__updated) * self.__rate,
+            )
+            self.__updated = now
+
+            wait = max(0.0, (1 - self.__tokens) / self.__rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            # Tokens go negative for requests queued behind this one
+            self.__tokens -= 1
+            return wait
+
+    def acquire(self, max_wait=None):
+        """Block until a token is available.
+
+        Returns
+        -------
+        acquired : bool
+            False if the wait would exceed max_wait.
+        """
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+# Buckets shared by all clients, keyed by host
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def set_rate_limit(host, rate, burst=None):
+    """Limit requests sent to the host.
+
+    Parameters
+    ----------
+    host : str
+        Host name, e.g. "api.clashroyale.com".
+    rate : float
+        Requests per second.
+    burst : int
+        Requests allowed at once, defaults to rate.
+    """
+    with _buckets_lock:
+        _buckets[host] = TokenBucket(rate, burst)
+
+
+def get_bucket(host):
+    """Get the token bucket of the host, None if the host is not limited."""
+    return _buckets.get(host)
+
+
+def get_backoff(attempt, base_delay=0.5, max_delay=8.0):
+    """Get exponential backoff with full jitter.
+
+    Parameters
+    ----------
+    attempt : int
+        Number of attempts failed so far, starts from 0.
+
+    Examples
+    --------
+    >>> 0 <= get_backoff(3, base_delay=1, max_delay=4) <= 4
+    True
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+def get_retry_after(headers):
+    """Get seconds to wait from Retry-After header, None if absent.
+
+    Examples
+    --------
+    >>> get_retry_after({"Retry-After": "3"})
+    3.0
+
+    >>> get_retry_after({}) is None
+    True
+    """
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime_wrapper.get_utcnow()).total_seconds())
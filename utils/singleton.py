@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
 
+import threading
+
+
 class Singleton(type):
-    """ A metaclass that creates a Singleton base class when called. """
+    """ A metaclass that creates a Singleton base class when called.
+
+    One instance is created for each set of call arguments.
+    """
     _instances = {}
+    _lock = threading.RLock()
 
     def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(
-                Singleton, cls).__call__(*args, **kwargs)
-        return cls._instances[cls]
+        key = (cls, args, tuple(sorted(kwargs.items())))
+        with cls._lock:
+            if key not in cls._instances:
+                cls._instances[key] = super(
+                    Singleton, cls).__call__(*args, **kwargs)
+        return cls._instances[key]
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import sys
+
+from utils.alignment import get_width, iter_clusters, remove_ansi_escape
+
+ELLIPSIS = "…"
+
+
+class Column:
+    """Spec of a table column.
+
+    Parameters
+    ----------
+    header : str
+        Header of the column, "" for none.
+    dir : str
+        'l' means left, 'r' means right.
+    min_width : int
+        Minimum width, also the narrowest width when fitting the terminal.
+    shrink : bool
+        Whether the column can be truncated to fit the terminal.
+    """
+
+    def __init__(self, header="", dir="l", min_width=0, shrink=False):
+        self.header = header
+        self.dir = dir
+        self.min_width = min_width
+        self.shrink = shrink
+
+
+def get_terminal_width():
+    """Get width of the terminal, None if output is not a terminal."""
+    if not sys.stdout.isatty():
+        # Redirected or piped, never truncate
+        return None
+    return shutil.get_terminal_size().columns
+
+
+def truncate(string, width):
+    """Truncate string to the display width, marked with an ellipsis.
+
+    Examples
+    --------
+    >>> truncate("Hello", 8)
+    'Hello'
+
+    >>> truncate("Hello World", 8)
+    'Hello W…'
+
+    >>> truncate("你好世界", 5)
+    '你好…'
+    """
+    if get_width(string) <= width:
+        return string
+
+    width -= get_width(ELLIPSIS)
+    res = ""
+    res_width = 0
+    # Cut between clusters, never inside an emoji sequence
+    for cluster in iter_clusters(remove_ansi_escape(string)):
+        cluster_width = get_width(cluster)
+        if res_width + cluster_width > width:
+            break
+        res += cluster
+        res_width += cluster_width
+    return res + ELLIPSIS
+
+
+def pad(string, width, dir="l"):
+    """Pad string to the display width.
+
+    Examples
+    --------
+    >>> pad("你好", 6, dir="r")
+    '  你好'
+
+    >>> pad("", 3)
+    '   '
+    """
+    diff = max(width - get_width(string), 0)
+    if dir == "r":
+        return " " * diff + string
+    return string + " " * diff
+
+
+class Table:
+    """Table rendered from rows of cells.
+
+    Widths of all columns are measured in one pass over the cells, then
+    shrinkable columns are truncated if the table is wider than the terminal.
+
+    Parameters
+    ----------
+    columns : list
+        Column of each field.
+    sep : str
+        Separator between columns.
+    indent : str
+        Prefix of each line.
+
+    Examples
+    --------
+    >>> table = Table([Column("名字"), Column("獎盃", dir="r")], sep=" ")
+    >>> table.add_row("Alice", 5000)
+    >>> table.add_row("鄭", 12)
+    >>> print("\\n".join(table.render(max_width=None)))
+    名字  獎盃
+    Alice 5000
+    鄭      12
+    """
+
+    def __init__(self, columns, sep="", indent=""):
+        self.__columns = columns
+        self.__sep = sep
+        self.__indent = indent
+        self.__rows = []
+
+    def add_row(self, *cells):
+        self.__rows.append(["" if cell is None else str(cell) for cell in cells])
+
+    def __has_header(self):
+        return any(column.header for column in self.__columns)
+
+    def get_widths(self, max_width=None):
+        """Get width of each column.
+
+        Parameters
+        ----------
+        max_width : int
+            Width available to the table, None for no limit.
+        """
+        widths = [column.min_width for column in self.__columns]
+        rows = self.__rows
+        if self.__has_header():
+            rows = [[column.header for column in self.__columns]] + rows
+        for row in rows:
+            for i, cell in enumerate(row):
+                widths[i] = max(widths[i], get_width(cell))
+
+        if max_width is not None:
+            over = self.get_total_width(widths) - max_width
+            # Take the excess from the widest shrinkable columns first
+            while over > 0:
+                candidates = [
+                    i
+                    for i, column in enumerate(self.__columns)
+                    if column.shrink and widths[i] > max(column.min_width, 1)
+                ]
+                if not candidates:
+                    break
+                i = max(candidates, key=lambda i: widths[i])
+                widths[i] -= 1
+                over -= 1
+
+        return widths
+
+    def get_total_width(self, widths=None):
+        widths = widths if widths is not None else self.get_widths()
+        return (
+            get_width(self.__indent)
+            + sum(widths)
+            + get_width(self.__sep) * (len(widths) - 1)
+        )
+
+    def __render_row(self, row, widths):
+        cells = [
+            pad(truncate(cell, width), width, column.dir)
+            for cell, width, column in zip(row, widths, self.__columns)
+        ]
+        return (self.__indent + self.__sep.join(cells)).rstrip()
+
+    def render(self, max_width=0, rule=""):
+        """Render the table into lines.
+
+        Parameters
+        ----------
+        max_width : int
+            Width available to the table, 0 for the terminal width and None
+            for no limit.
+        rule : str
+            Character of the rule under the header, "" for none.
+
+        Returns
+        -------
+        lines : list
+            Lines without newlines.
+        """
+        if max_width == 0:
+            max_width = get_terminal_width()
+        widths = self.get_widths(max_width)
+
+        lines = []
+        if self.__has_header():
+            lines.append(
+                self.__render_row([column.header for column in self.__columns], widths)
+            )
+            if rule:
+                lines.append(rule * self.get_total_width(widths))
+        lines.extend(self.__render_row(row, widths) for row in self.__rows)
+        return lines
+
+
+def write(lines, file=None):
+    """Write lines at once.
+
+    Parameters
+    ----------
+    lines : list
+        Lines without newlines.
+    file : file object
+        Defaults to sys.stdout.
+    """
+    file = file or sys.stdout
+    file.write("".join(line + "\n" for line in lines))
+    file.flush()
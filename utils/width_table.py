@@ -0,0 +1,622 @@
+# -*- coding: utf-8 -*-
+"""Display width tables of Unicode code points.
+
+Generated from unicodedata, regenerate with `python -m utils.width_table`.
+Emoji tables are kept by hand above the generated part.
+Ranges are sorted (start, end) pairs with both ends included. Unassigned
+code points are folded into neighbouring ranges.
+"""
+
+import os
+import unicodedata
+
+MARKER = "# Generated tables"
+
+# Emoji properties are not in unicodedata, these follow emoji-data.txt
+# Extended_Pictographic, bases of emoji sequences
+PICTOGRAPHIC = (
+    (0x000A9, 0x000A9),
+    (0x000AE, 0x000AE),
+    (0x0203C, 0x0203C),
+    (0x02049, 0x02049),
+    (0x02122, 0x02122),
+    (0x02139, 0x02139),
+    (0x02194, 0x02199),
+    (0x021A9, 0x021AA),
+    (0x0231A, 0x0231B),
+    (0x02328, 0x02328),
+    (0x02388, 0x02388),
+    (0x023CF, 0x023CF),
+    (0x023E9, 0x023F3),
+    (0x023F8, 0x023FA),
+    (0x024C2, 0x024C2),
+    (0x025AA, 0x025AB),
+    (0x025B6, 0x025B6),
+    (0x025C0, 0x025C0),
+    (0x025FB, 0x025FE),
+    (0x02600, 0x02605),
+    (0x02607, 0x02612),
+    (0x02614, 0x02685),
+    (0x02690, 0x02705),
+    (0x02708, 0x02712),
+    (0x02714, 0x02714),
+    (0x02716, 0x02716),
+    (0x0271D, 0x0271D),
+    (0x02721, 0x02721),
+    (0x02728, 0x02728),
+    (0x02733, 0x02734),
+    (0x02744, 0x02744),
+    (0x02747, 0x02747),
+    (0x0274C, 0x0274C),
+    (0x0274E, 0x0274E),
+    (0x02753, 0x02755),
+    (0x02757, 0x02757),
+    (0x02763, 0x02767),
+    (0x02795, 0x02797),
+    (0x027A1, 0x027A1),
+    (0x027B0, 0x027B0),
+    (0x027BF, 0x027BF),
+    (0x02934, 0x02935),
+    (0x02B05, 0x02B07),
+    (0x02B1B, 0x02B1C),
+    (0x02B50, 0x02B50),
+    (0x02B55, 0x02B55),
+    (0x03030, 0x03030),
+    (0x0303D, 0x0303D),
+    (0x03297, 0x03297),
+    (0x03299, 0x03299),
+    (0x1F000, 0x1F0FF),
+    (0x1F10D, 0x1F10F),
+    (0x1F12F, 0x1F12F),
+    (0x1F16C, 0x1F171),
+    (0x1F17E, 0x1F17F),
+    (0x1F18E, 0x1F18E),
+    (0x1F191, 0x1F19A),
+    (0x1F1AD, 0x1F1E5),
+    (0x1F201, 0x1F20F),
+    (0x1F21A, 0x1F21A),
+    (0x1F22F, 0x1F22F),
+    (0x1F232, 0x1F23A),
+    (0x1F23C, 0x1F23F),
+    (0x1F249, 0x1F3FA),
+    (0x1F400, 0x1F53D),
+    (0x1F546, 0x1F64F),
+    (0x1F680, 0x1F6FF),
+    (0x1F774, 0x1F77F),
+    (0x1F7D5, 0x1F7FF),
+    (0x1F80C, 0x1F80F),
+    (0x1F848, 0x1F84F),
+    (0x1F85A, 0x1F85F),
+    (0x1F888, 0x1F88F),
+    (0x1F8AE, 0x1F8FF),
+    (0x1F90C, 0x1F93A),
+    (0x1F93C, 0x1F945),
+    (0x1F947, 0x1FAFF),
+    (0x1FC00, 0x1FFFD),
+)
+# Skin tone modifiers
+EMOJI_MODIFIER = ((0x1F3FB, 0x1F3FF),)
+# Letters of flags, paired into one
+REGIONAL_INDICATOR = ((0x1F1E6, 0x1F1FF),)
+# Tags of subdivision flags, e.g. England
+TAG = ((0xE0020, 0xE007F),)
+
+
+def _build_ranges(pred):
+    ranges = []
+    start = end = None
+    for cp in range(0x110000):
+        if unicodedata.category(chr(cp)) == "Cn":
+            # Unassigned, join whichever range surrounds it
+            continue
+        if pred(cp):
+            if start is None:
+                start = cp
+            end = cp
+        elif start is not None:
+            ranges.append((start, end))
+            start = None
+    if start is not None:
+        ranges.append((start, end))
+    return ranges
+
+
+def _format_table(name, ranges):
+    lines = [f"{name} = ("]
+    lines += [f"    (0x{start:05X}, 0x{end:05X})," for start, end in ranges]
+    lines.append(")")
+    return "\n".join(lines)
+
+
+def generate():
+    """Rewrite this module with tables of the running unicodedata."""
+    path = os.path.realpath(__file__)
+    with open(path, encoding="utf-8") as module_file:
+        source = module_file.read()
+    # The marker line, not its mentions in this code, ends the handwritten part
+    head = source[: source.index(f"\n{MARKER}\n") + 1]
+
+    tables = [
+        _format_table(
+            "WIDE",
+            _build_ranges(
+                lambda cp: unicodedata.east_asian_width(chr(cp)) in ("W", "F")
+            ),
+        ),
+        _format_table(
+            "AMBIGUOUS",
+            _build_ranges(lambda cp: unicodedata.east_asian_width(chr(cp)) == "A"),
+        ),
+        _format_table(
+            "ZERO_WIDTH",
+            # Combining marks, zero width space/joiners and variation selectors
+            _build_ranges(
+                lambda cp: unicodedata.combining(chr(cp)) != 0
+                or 0x200B <= cp <= 0x200D
+                or 0xFE00 <= cp <= 0xFE0F
+                or 0xE0100 <= cp <= 0xE01EF
+            ),
+        ),
+    ]
+    with open(path, "w", encoding="utf-8") as module_file:
+        module_file.write(head)
+        module_file.write(f"{MARKER}\n")
+        module_file.write(f'UNIDATA_VERSION = "{unicodedata.unidata_version}"\n\n')
+        module_file.write("\n\n".join(tables) + "\n")
+
+
+if __name__ == "__main__":
+    generate()
+
+
+# Generated tables
+UNIDATA_VERSION = "14.0.0"
+
+WIDE = (
+    (0x01100, 0x0115F),
+    (0x0231A, 0x0231B),
+    (0x02329, 0x0232A),
+    (0x023E9, 0x023EC),
+    (0x023F0, 0x023F0),
+    (0x023F3, 0x023F3),
+    (0x025FD, 0x025FE),
+    (0x02614, 0x02615),
+    (0x02648, 0x02653),
+    (0x0267F, 0x0267F),
+    (0x02693, 0x02693),
+    (0x026A1, 0x026A1),
+    (0x026AA, 0x026AB),
+    (0x026BD, 0x026BE),
+    (0x026C4, 0x026C5),
+    (0x026CE, 0x026CE),
+    (0x026D4, 0x026D4),
+    (0x026EA, 0x026EA),
+    (0x026F2, 0x026F3),
+    (0x026F5, 0x026F5),
+    (0x026FA, 0x026FA),
+    (0x026FD, 0x026FD),
+    (0x02705, 0x02705),
+    (0x0270A, 0x0270B),
+    (0x02728, 0x02728),
+    (0x0274C, 0x0274C),
+    (0x0274E, 0x0274E),
+    (0x02753, 0x02755),
+    (0x02757, 0x02757),
+    (0x02795, 0x02797),
+    (0x027B0, 0x027B0),
+    (0x027BF, 0x027BF),
+    (0x02B1B, 0x02B1C),
+    (0x02B50, 0x02B50),
+    (0x02B55, 0x02B55),
+    (0x02E80, 0x0303E),
+    (0x03041, 0x03247),
+    (0x03250, 0x04DBF),
+    (0x04E00, 0x0A4C6),
+    (0x0A960, 0x0A97C),
+    (0x0AC00, 0x0D7A3),
+    (0x0F900, 0x0FAD9),
+    (0x0FE10, 0x0FE19),
+    (0x0FE30, 0x0FE6B),
+    (0x0FF01, 0x0FF60),
+    (0x0FFE0, 0x0FFE6),
+    (0x16FE0, 0x1B2FB),
+    (0x1F004, 0x1F004),
+    (0x1F0CF, 0x1F0CF),
+    (0x1F18E, 0x1F18E),
+    (0x1F191, 0x1F19A),
+    (0x1F200, 0x1F320),
+    (0x1F32D, 0x1F335),
+    (0x1F337, 0x1F37C),
+    (0x1F37E, 0x1F393),
+    (0x1F3A0, 0x1F3CA),
+    (0x1F3CF, 0x1F3D3),
+    (0x1F3E0, 0x1F3F0),
+    (0x1F3F4, 0x1F3F4),
+    (0x1F3F8, 0x1F43E),
+    (0x1F440, 0x1F440),
+    (0x1F442, 0x1F4FC),
+    (0x1F4FF, 0x1F53D),
+    (0x1F54B, 0x1F54E),
+    (0x1F550, 0x1F567),
+    (0x1F57A, 0x1F57A),
+    (0x1F595, 0x1F596),
+    (0x1F5A4, 0x1F5A4),
+    (0x1F5FB, 0x1F64F),
+    (0x1F680, 0x1F6C5),
+    (0x1F6CC, 0x1F6CC),
+    (0x1F6D0, 0x1F6D2),
+    (0x1F6D5, 0x1F6DF),
+    (0x1F6EB, 0x1F6EC),
+    (0x1F6F4, 0x1F6FC),
+    (0x1F7E0, 0x1F7F0),
+    (0x1F90C, 0x1F93A),
+    (0x1F93C, 0x1F945),
+    (0x1F947, 0x1F9FF),
+    (0x1FA70, 0x1FAF6),
+    (0x20000, 0x3134A),
+)
+
+AMBIGUOUS = (
+    (0x000A1, 0x000A1),
+    (0x000A4, 0x000A4),
+    (0x000A7, 0x000A8),
+    (0x000AA, 0x000AA),
+    (0x000AD, 0x000AE),
+    (0x000B0, 0x000B4),
+    (0x000B6, 0x000BA),
+    (0x000BC, 0x000BF),
+    (0x000C6, 0x000C6),
+    (0x000D0, 0x000D0),
+    (0x000D7, 0x000D8),
+    (0x000DE, 0x000E1),
+    (0x000E6, 0x000E6),
+    (0x000E8, 0x000EA),
+    (0x000EC, 0x000ED),
+    (0x000F0, 0x000F0),
+    (0x000F2, 0x000F3),
+    (0x000F7, 0x000FA),
+    (0x000FC, 0x000FC),
+    (0x000FE, 0x000FE),
+    (0x00101, 0x00101),
+    (0x00111, 0x00111),
+    (0x00113, 0x00113),
+    (0x0011B, 0x0011B),
+    (0x00126, 0x00127),
+    (0x0012B, 0x0012B),
+    (0x00131, 0x00133),
+    (0x00138, 0x00138),
+    (0x0013F, 0x00142),
+    (0x00144, 0x00144),
+    (0x00148, 0x0014B),
+    (0x0014D, 0x0014D),
+    (0x00152, 0x00153),
+    (0x00166, 0x00167),
+    (0x0016B, 0x0016B),
+    (0x001CE, 0x001CE),
+    (0x001D0, 0x001D0),
+    (0x001D2, 0x001D2),
+    (0x001D4, 0x001D4),
+    (0x001D6, 0x001D6),
+    (0x001D8, 0x001D8),
+    (0x001DA, 0x001DA),
+    (0x001DC, 0x001DC),
+    (0x00251, 0x00251),
+    (0x00261, 0x00261),
+    (0x002C4, 0x002C4),
+    (0x002C7, 0x002C7),
+    (0x002C9, 0x002CB),
+    (0x002CD, 0x002CD),
+    (0x002D0, 0x002D0),
+    (0x002D8, 0x002DB),
+    (0x002DD, 0x002DD),
+    (0x002DF, 0x002DF),
+    (0x00300, 0x0036F),
+    (0x00391, 0x003A9),
+    (0x003B1, 0x003C1),
+    (0x003C3, 0x003C9),
+    (0x00401, 0x00401),
+    (0x00410, 0x0044F),
+    (0x00451, 0x00451),
+    (0x02010, 0x02010),
+    (0x02013, 0x02016),
+    (0x02018, 0x02019),
+    (0x0201C, 0x0201D),
+    (0x02020, 0x02022),
+    (0x02024, 0x02027),
+    (0x02030, 0x02030),
+    (0x02032, 0x02033),
+    (0x02035, 0x02035),
+    (0x0203B, 0x0203B),
+    (0x0203E, 0x0203E),
+    (0x02074, 0x02074),
+    (0x0207F, 0x0207F),
+    (0x02081, 0x02084),
+    (0x020AC, 0x020AC),
+    (0x02103, 0x02103),
+    (0x02105, 0x02105),
+    (0x02109, 0x02109),
+    (0x02113, 0x02113),
+    (0x02116, 0x02116),
+    (0x02121, 0x02122),
+    (0x02126, 0x02126),
+    (0x0212B, 0x0212B),
+    (0x02153, 0x02154),
+    (0x0215B, 0x0215E),
+    (0x02160, 0x0216B),
+    (0x02170, 0x02179),
+    (0x02189, 0x02189),
+    (0x02190, 0x02199),
+    (0x021B8, 0x021B9),
+    (0x021D2, 0x021D2),
+    (0x021D4, 0x021D4),
+    (0x021E7, 0x021E7),
+    (0x02200, 0x02200),
+    (0x02202, 0x02203),
+    (0x02207, 0x02208),
+    (0x0220B, 0x0220B),
+    (0x0220F, 0x0220F),
+    (0x02211, 0x02211),
+    (0x02215, 0x02215),
+    (0x0221A, 0x0221A),
+    (0x0221D, 0x02220),
+    (0x02223, 0x02223),
+    (0x02225, 0x02225),
+    (0x02227, 0x0222C),
+    (0x0222E, 0x0222E),
+    (0x02234, 0x02237),
+    (0x0223C, 0x0223D),
+    (0x02248, 0x02248),
+    (0x0224C, 0x0224C),
+    (0x02252, 0x02252),
+    (0x02260, 0x02261),
+    (0x02264, 0x02267),
+    (0x0226A, 0x0226B),
+    (0x0226E, 0x0226F),
+    (0x02282, 0x02283),
+    (0x02286, 0x02287),
+    (0x02295, 0x02295),
+    (0x02299, 0x02299),
+    (0x022A5, 0x022A5),
+    (0x022BF, 0x022BF),
+    (0x02312, 0x02312),
+    (0x02460, 0x024E9),
+    (0x024EB, 0x0254B),
+    (0x02550, 0x02573),
+    (0x02580, 0x0258F),
+    (0x02592, 0x02595),
+    (0x025A0, 0x025A1),
+    (0x025A3, 0x025A9),
+    (0x025B2, 0x025B3),
+    (0x025B6, 0x025B7),
+    (0x025BC, 0x025BD),
+    (0x025C0, 0x025C1),
+    (0x025C6, 0x025C8),
+    (0x025CB, 0x025CB),
+    (0x025CE, 0x025D1),
+    (0x025E2, 0x025E5),
+    (0x025EF, 0x025EF),
+    (0x02605, 0x02606),
+    (0x02609, 0x02609),
+    (0x0260E, 0x0260F),
+    (0x0261C, 0x0261C),
+    (0x0261E, 0x0261E),
+    (0x02640, 0x02640),
+    (0x02642, 0x02642),
+    (0x02660, 0x02661),
+    (0x02663, 0x02665),
+    (0x02667, 0x0266A),
+    (0x0266C, 0x0266D),
+    (0x0266F, 0x0266F),
+    (0x0269E, 0x0269F),
+    (0x026BF, 0x026BF),
+    (0x026C6, 0x026CD),
+    (0x026CF, 0x026D3),
+    (0x026D5, 0x026E1),
+    (0x026E3, 0x026E3),
+    (0x026E8, 0x026E9),
+    (0x026EB, 0x026F1),
+    (0x026F4, 0x026F4),
+    (0x026F6, 0x026F9),
+    (0x026FB, 0x026FC),
+    (0x026FE, 0x026FF),
+    (0x0273D, 0x0273D),
+    (0x02776, 0x0277F),
+    (0x02B56, 0x02B59),
+    (0x03248, 0x0324F),
+    (0x0E000, 0x0F8FF),
+    (0x0FE00, 0x0FE0F),
+    (0x0FFFD, 0x0FFFD),
+    (0x1F100, 0x1F10A),
+    (0x1F110, 0x1F12D),
+    (0x1F130, 0x1F169),
+    (0x1F170, 0x1F18D),
+    (0x1F18F, 0x1F190),
+    (0x1F19B, 0x1F1AC),
+    (0xE0100, 0x10FFFD),
+)
+
+ZERO_WIDTH = (
+    (0x00300, 0x0034E),
+    (0x00350, 0x0036F),
+    (0x00483, 0x00487),
+    (0x00591, 0x005BD),
+    (0x005BF, 0x005BF),
+    (0x005C1, 0x005C2),
+    (0x005C4, 0x005C5),
+    (0x005C7, 0x005C7),
+    (0x00610, 0x0061A),
+    (0x0064B, 0x0065F),
+    (0x00670, 0x00670),
+    (0x006D6, 0x006DC),
+    (0x006DF, 0x006E4),
+    (0x006E7, 0x006E8),
+    (0x006EA, 0x006ED),
+    (0x00711, 0x00711),
+    (0x00730, 0x0074A),
+    (0x007EB, 0x007F3),
+    (0x007FD, 0x007FD),
+    (0x00816, 0x00819),
+    (0x0081B, 0x00823),
+    (0x00825, 0x00827),
+    (0x00829, 0x0082D),
+    (0x00859, 0x0085B),
+    (0x00898, 0x0089F),
+    (0x008CA, 0x008E1),
+    (0x008E3, 0x008FF),
+    (0x0093C, 0x0093C),
+    (0x0094D, 0x0094D),
+    (0x00951, 0x00954),
+    (0x009BC, 0x009BC),
+    (0x009CD, 0x009CD),
+    (0x009FE, 0x009FE),
+    (0x00A3C, 0x00A3C),
+    (0x00A4D, 0x00A4D),
+    (0x00ABC, 0x00ABC),
+    (0x00ACD, 0x00ACD),
+    (0x00B3C, 0x00B3C),
+    (0x00B4D, 0x00B4D),
+    (0x00BCD, 0x00BCD),
+    (0x00C3C, 0x00C3C),
+    (0x00C4D, 0x00C56),
+    (0x00CBC, 0x00CBC),
+    (0x00CCD, 0x00CCD),
+    (0x00D3B, 0x00D3C),
+    (0x00D4D, 0x00D4D),
+    (0x00DCA, 0x00DCA),
+    (0x00E38, 0x00E3A),
+    (0x00E48, 0x00E4B),
+    (0x00EB8, 0x00EBA),
+    (0x00EC8, 0x00ECB),
+    (0x00F18, 0x00F19),
+    (0x00F35, 0x00F35),
+    (0x00F37, 0x00F37),
+    (0x00F39, 0x00F39),
+    (0x00F71, 0x00F72),
+    (0x00F74, 0x00F74),
+    (0x00F7A, 0x00F7D),
+    (0x00F80, 0x00F80),
+    (0x00F82, 0x00F84),
+    (0x00F86, 0x00F87),
+    (0x00FC6, 0x00FC6),
+    (0x01037, 0x01037),
+    (0x01039, 0x0103A),
+    (0x0108D, 0x0108D),
+    (0x0135D, 0x0135F),
+    (0x01714, 0x01715),
+    (0x01734, 0x01734),
+    (0x017D2, 0x017D2),
+    (0x017DD, 0x017DD),
+    (0x018A9, 0x018A9),
+    (0x01939, 0x0193B),
+    (0x01A17, 0x01A18),
+    (0x01A60, 0x01A60),
+    (0x01A75, 0x01A7F),
+    (0x01AB0, 0x01ABD),
+    (0x01ABF, 0x01ACE),
+    (0x01B34, 0x01B34),
+    (0x01B44, 0x01B44),
+    (0x01B6B, 0x01B73),
+    (0x01BAA, 0x01BAB),
+    (0x01BE6, 0x01BE6),
+    (0x01BF2, 0x01BF3),
+    (0x01C37, 0x01C37),
+    (0x01CD0, 0x01CD2),
+    (0x01CD4, 0x01CE0),
+    (0x01CE2, 0x01CE8),
+    (0x01CED, 0x01CED),
+    (0x01CF4, 0x01CF4),
+    (0x01CF8, 0x01CF9),
+    (0x01DC0, 0x01DFF),
+    (0x0200B, 0x0200D),
+    (0x020D0, 0x020DC),
+    (0x020E1, 0x020E1),
+    (0x020E5, 0x020F0),
+    (0x02CEF, 0x02CF1),
+    (0x02D7F, 0x02D7F),
+    (0x02DE0, 0x02DFF),
+    (0x0302A, 0x0302F),
+    (0x03099, 0x0309A),
+    (0x0A66F, 0x0A66F),
+    (0x0A674, 0x0A67D),
+    (0x0A69E, 0x0A69F),
+    (0x0A6F0, 0x0A6F1),
+    (0x0A806, 0x0A806),
+    (0x0A82C, 0x0A82C),
+    (0x0A8C4, 0x0A8C4),
+    (0x0A8E0, 0x0A8F1),
+    (0x0A92B, 0x0A92D),
+    (0x0A953, 0x0A953),
+    (0x0A9B3, 0x0A9B3),
+    (0x0A9C0, 0x0A9C0),
+    (0x0AAB0, 0x0AAB0),
+    (0x0AAB2, 0x0AAB4),
+    (0x0AAB7, 0x0AAB8),
+    (0x0AABE, 0x0AABF),
+    (0x0AAC1, 0x0AAC1),
+    (0x0AAF6, 0x0AAF6),
+    (0x0ABED, 0x0ABED),
+    (0x0FB1E, 0x0FB1E),
+    (0x0FE00, 0x0FE0F),
+    (0x0FE20, 0x0FE2F),
+    (0x101FD, 0x101FD),
+    (0x102E0, 0x102E0),
+    (0x10376, 0x1037A),
+    (0x10A0D, 0x10A0D),
+    (0x10A0F, 0x10A0F),
+    (0x10A38, 0x10A3F),
+    (0x10AE5, 0x10AE6),
+    (0x10D24, 0x10D27),
+    (0x10EAB, 0x10EAC),
+    (0x10F46, 0x10F50),
+    (0x10F82, 0x10F85),
+    (0x11046, 0x11046),
+    (0x11070, 0x11070),
+    (0x1107F, 0x1107F),
+    (0x110B9, 0x110BA),
+    (0x11100, 0x11102),
+    (0x11133, 0x11134),
+    (0x11173, 0x11173),
+    (0x111C0, 0x111C0),
+    (0x111CA, 0x111CA),
+    (0x11235, 0x11236),
+    (0x112E9, 0x112EA),
+    (0x1133B, 0x1133C),
+    (0x1134D, 0x1134D),
+    (0x11366, 0x11374),
+    (0x11442, 0x11442),
+    (0x11446, 0x11446),
+    (0x1145E, 0x1145E),
+    (0x114C2, 0x114C3),
+    (0x115BF, 0x115C0),
+    (0x1163F, 0x1163F),
+    (0x116B6, 0x116B7),
+    (0x1172B, 0x1172B),
+    (0x11839, 0x1183A),
+    (0x1193D, 0x1193E),
+    (0x11943, 0x11943),
+    (0x119E0, 0x119E0),
+    (0x11A34, 0x11A34),
+    (0x11A47, 0x11A47),
+    (0x11A99, 0x11A99),
+    (0x11C3F, 0x11C3F),
+    (0x11D42, 0x11D42),
+    (0x11D44, 0x11D45),
+    (0x11D97, 0x11D97),
+    (0x16AF0, 0x16AF4),
+    (0x16B30, 0x16B36),
+    (0x16FF0, 0x16FF1),
+    (0x1BC9E, 0x1BC9E),
+    (0x1D165, 0x1D169),
+    (0x1D16D, 0x1D172),
+    (0x1D17B, 0x1D182),
+    (0x1D185, 0x1D18B),
+    (0x1D1AA, 0x1D1AD),
+    (0x1D242, 0x1D244),
+    (0x1E000, 0x1E02A),
+    (0x1E130, 0x1E136),
+    (0x1E2AE, 0x1E2AE),
+    (0x1E2EC, 0x1E2EF),
+    (0x1E8D0, 0x1E8D6),
+    (0x1E944, 0x1E94A),
+    (0xE0100, 0xE01EF),
+)